@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import site
 
-from account.models import Account, ProfilePicture
+from account.models import Account, ExpiringToken, OutboundEmail, ProfilePicture
 
 
 class ProfilePictureInline(admin.TabularInline):
@@ -24,5 +24,28 @@ class AccountAdmin(admin.ModelAdmin):
     inlines = [ProfilePictureInline, ]
 
 
+class ExpiringTokenAdmin(admin.ModelAdmin):
+    list_display = ["key", "user", "created", "expires_at"]
+    search_fields = ["user__username"]
+    ordering = ("-created",)
+    raw_id_fields = ["user"]
+
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ["subject", "status", "attempts", "next_attempt_at", "created_at", "sent_at"]
+    list_filter = ("status",)
+    ordering = ("-created_at",)
+    readonly_fields = ["attempts", "last_error", "created_at", "sent_at"]
+    actions = ["requeue"]
+
+    def requeue(self, request, queryset):
+        for message in queryset.exclude(status=OutboundEmail.SENT):
+            message.requeue()
+
+    requeue.short_description = "Requeue selected unsent emails"
+
+
 site.register(Account, AccountAdmin)
 admin.site.register(ProfilePicture, ProfilePictureAdmin)
+admin.site.register(ExpiringToken, ExpiringTokenAdmin)
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('username', 'email')
+
+
+def normalize(value):
+    return value.strip().lower()
+
+
+class BloomFilter:
+    """
+    Set membership in a fixed bit array. `value in bloom` is never False for
+    an added value, and True for a value that was not added with about
+    `error_rate` probability once `capacity` values are added.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def from_bits(cls, size, hash_count, bits):
+        bloom = cls.__new__(cls)
+        bloom.size, bloom.hash_count, bloom.bits = size, hash_count, bytearray(bits)
+        return bloom
+
+    def _positions(self, value):
+        # Double hashing over one 128 bit digest.
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class AvailabilityIndex:
+    """
+    Answers whether usernames and emails are taken, compared case
+    insensitively.
+
+    Each process keeps a Bloom filter per field, refreshed in a background
+    thread once it is AVAILABILITY_BLOOM_MAX_AGE seconds old. The filters
+    are shared through the cache: one process rebuilds them from the
+    database and the others load its build. Values the filter has never
+    seen are free without a database query, unless they were taken after
+    the filters were built, which `remember` records in the shared cache.
+    Everything else is looked up in the database.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.filters = None
+        self.built_at = None
+        self.checked_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def recent_key(self, field, value):
+        return "{prefix}:{field}:{value}".format(
+            prefix=self.prefix, field=field, value=hashlib.md5(value.encode('utf-8')).hexdigest(),
+        )
+
+    @property
+    def filters_key(self):
+        return "{prefix}:filters".format(prefix=self.prefix)
+
+    @property
+    def build_lock_key(self):
+        return "{prefix}:building".format(prefix=self.prefix)
+
+    def chunk_key(self, build_id, field, n):
+        return "{prefix}:filters:{build_id}:{field}:{n}".format(prefix=self.prefix, build_id=build_id, field=field, n=n)
+
+    def remember(self, account, fields=FIELDS):
+        """
+        Records the `fields` of `account`, so processes whose filters predate
+        it still see them as taken.
+        """
+        max_age = settings.AVAILABILITY_BLOOM_MAX_AGE
+        if not max_age or not fields:
+            return
+
+        # Outlives the oldest filter that can miss the account, including the
+        # time it takes to build one.
+        cache.set_many({
+            self.recent_key(field, normalize(getattr(account, field))): True for field in fields
+        }, timeout=max_age * 2)
+
+    def build(self):
+        """
+        Builds the filters from the database. Returns the number of accounts.
+        """
+        Account = get_user_model()
+        count = Account.objects.count()
+        # Leaves room for the accounts created until the next rebuild.
+        capacity = int(count * 1.1) + 1000
+        filters = {
+            field: BloomFilter(capacity, settings.AVAILABILITY_BLOOM_ERROR_RATE) for field in FIELDS
+        }
+
+        built_at = time.time()
+        rows = Account.objects.annotate(
+            username_lower=Lower('username'), email_lower=Lower('email'),
+        ).values_list('username_lower', 'email_lower')
+        for username, email in rows.iterator(chunk_size=10000):
+            filters['username'].add(username)
+            filters['email'].add(email)
+
+        self.filters, self.built_at = filters, built_at
+        return count
+
+    def share(self):
+        """
+        Stores the filters in the shared cache, split in entries of at most
+        AVAILABILITY_BLOOM_CHUNK_SIZE bytes, and then the manifest pointing
+        to them. Returns whether every entry was stored.
+        """
+        timeout = settings.AVAILABILITY_BLOOM_MAX_AGE * 2
+        chunk_size = settings.AVAILABILITY_BLOOM_CHUNK_SIZE
+        build_id = uuid.uuid4().hex
+        manifest = {'built_at': self.built_at, 'build_id': build_id, 'filters': {}}
+
+        for field, bloom in self.filters.items():
+            starts = range(0, len(bloom.bits), chunk_size)
+            for n, start in enumerate(starts):
+                if cache.set_many({self.chunk_key(build_id, field, n): bytes(bloom.bits[start:start + chunk_size])}, timeout):
+                    return False
+            manifest['filters'][field] = {'size': bloom.size, 'hash_count': bloom.hash_count, 'chunks': len(starts)}
+
+        return not cache.set_many({self.filters_key: manifest}, timeout)
+
+    def load(self, manifest):
+        """
+        The filters shared under `manifest`, or None if any of their entries
+        was evicted.
+        """
+        keys = {
+            field: [self.chunk_key(manifest['build_id'], field, n) for n in range(info['chunks'])]
+            for field, info in manifest['filters'].items()
+        }
+        chunks = cache.get_many([key for field_keys in keys.values() for key in field_keys])
+        if len(chunks) < sum(len(field_keys) for field_keys in keys.values()):
+            return None
+
+        return {
+            field: BloomFilter.from_bits(info['size'], info['hash_count'], b''.join(chunks[key] for key in keys[field]))
+            for field, info in manifest['filters'].items()
+        }
+
+    def refresh(self):
+        """
+        Replaces the filters with the ones in the shared cache, or builds
+        and shares new ones when those are stale too. While another process
+        is building them, the current filters are kept. When they cannot be
+        shared, every process builds its own.
+        """
+        max_age = settings.AVAILABILITY_BLOOM_MAX_AGE
+        manifest = cache.get(self.filters_key)
+        if manifest is not None and time.time() - manifest['built_at'] <= max_age:
+            if manifest['build_id'] is None:
+                self.build()
+                return
+            filters = self.load(manifest)
+            if filters is not None:
+                self.filters, self.built_at = filters, manifest['built_at']
+                return
+
+        if not cache.add(self.build_lock_key, True, timeout=max_age):
+            return
+        try:
+            self.build()
+            if not self.share():
+                logger.warning("The availability filters do not fit in the cache, every process builds its own")
+                cache.set(self.filters_key, {'built_at': self.built_at, 'build_id': None}, timeout=max_age)
+        finally:
+            cache.delete(self.build_lock_key)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Failed to refresh the availability filters")
+        finally:
+            self.checked_at = time.time()
+            self._refreshing = False
+            connection.close()
+
+    def get_filters(self):
+        """
+        Returns the current filters, or None if none were built yet. Starts a
+        refresh when they are missing or stale.
+        """
+        max_age = settings.AVAILABILITY_BLOOM_MAX_AGE
+        if not max_age:
+            return None
+
+        # Checked at most once per AVAILABILITY_BLOOM_CHECK_INTERVAL while
+        # another process is building them.
+        now = time.time()
+        stale = self.built_at is None or now - self.built_at > max_age
+        if stale and (self.checked_at is None or now - self.checked_at > settings.AVAILABILITY_BLOOM_CHECK_INTERVAL):
+            with self._lock:
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        if stale and self.built_at is not None and now - self.built_at > max_age * 2:
+            # Names taken since they were built are no longer remembered.
+            return None
+        return self.filters
+
+    def taken(self, field, values):
+        """
+        Returns the subset of the normalized `values` that is taken.
+        """
+        values = set(values)
+        filters = self.get_filters()
+
+        if filters is not None:
+            unseen = [value for value in values if value not in filters[field]]
+            if unseen:
+                recent = cache.get_many([self.recent_key(field, value) for value in unseen])
+                values -= {value for value in unseen if self.recent_key(field, value) not in recent}
+
+        if not values:
+            return set()
+        return set(get_user_model().objects.taken(field, values))
+
+
+availability_index = AvailabilityIndex('availability')
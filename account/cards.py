@@ -0,0 +1,111 @@
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+
+class UserCard(namedtuple('UserCard', [
+    'id', 'username', 'first_name', 'last_name', 'image', 'image_width', 'image_height', 'image_renditions',
+])):
+    """
+    What is shown of an account next to its posts: its names and its current
+    profile picture. The picture is kept as storage names, so that URLs,
+    which may be signed and expire, are only built when the card is rendered.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_account(cls, account):
+        """
+        Builds the card of `account`, whose `profile_picture` should already
+        be loaded with select_related.
+        """
+        picture = account.profile_picture
+        if picture is None or not picture.image:
+            image, width, height, rendition_names = None, None, None, ()
+        else:
+            image, width, height = picture.image.name, picture.image_width, picture.image_height
+            rendition_names = tuple((picture.image_renditions or {}).items())
+
+        return cls(
+            id=account.pk,
+            username=account.username,
+            first_name=account.first_name,
+            last_name=account.last_name,
+            image=image,
+            image_width=width,
+            image_height=height,
+            image_renditions=rendition_names,
+        )
+
+    @property
+    def full_name(self):
+        return " ".join(name for name in (self.first_name, self.last_name) if name)
+
+    def profile_picture(self, request=None):
+        """
+        The profile picture as ProfilePictureSerializer renders it.
+        """
+        storage = apps.get_model('account', 'ProfilePicture')._meta.get_field('image').storage
+
+        def url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return {
+            'image': url(self.image) if self.image else None,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'image_renditions': {rendition: url(name) for rendition, name in self.image_renditions},
+        }
+
+
+class UserCardCache:
+    """
+    Read-through cache of user cards. `get_many` resolves any number of
+    accounts with one multi-get and, for the accounts missing from the cache,
+    one query.
+    """
+
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def key(self, user_id):
+        return "{prefix}:{user_id}".format(prefix=self.prefix, user_id=user_id)
+
+    def load(self, user_ids):
+        Account = get_user_model()
+        accounts = Account.objects.filter(pk__in=user_ids).select_related('profile_picture').only(
+            'id', 'username', 'first_name', 'last_name', 'profile_picture',
+        )
+        return {account.pk: UserCard.from_account(account) for account in accounts}
+
+    def get_many(self, user_ids):
+        """
+        Returns a dict of the cards of `user_ids`, leaving out accounts that
+        do not exist.
+        """
+        keys = {self.key(user_id): user_id for user_id in set(user_ids)}
+        if not keys:
+            return {}
+
+        cards = {keys[key]: card for key, card in cache.get_many(list(keys)).items()}
+
+        missing = [user_id for user_id in keys.values() if user_id not in cards]
+        if missing:
+            loaded = self.load(missing)
+            cache.set_many({self.key(user_id): card for user_id, card in loaded.items()}, timeout=self.timeout)
+            cards.update(loaded)
+        return cards
+
+    def get(self, user_id):
+        return self.get_many([user_id]).get(user_id)
+
+    def invalidate(self, user_id):
+        cache.delete(self.key(user_id))
+
+
+user_cards = UserCardCache('user_card:v2', settings.USER_CARD_CACHE_TIMEOUT)
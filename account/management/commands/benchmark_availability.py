@@ -0,0 +1,75 @@
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from account.availability import availability_index
+from account.models import Account
+
+PREFIX = 'availability_benchmark_'
+
+
+class Command(BaseCommand):
+    help = "Measures the availability filters: build time, false positive rate and check latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Number of synthetic accounts to create first.")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Batch size used when seeding.")
+        parser.add_argument('--probes', type=int, default=100000, help="Free names probed for false positives.")
+        parser.add_argument('--repeat', type=int, default=1000, help="Number of timed checks per case.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'], options['batch_size'])
+
+        start = time.perf_counter()
+        count = availability_index.build()
+        filters = availability_index.filters
+        self.stdout.write("Built filters for {count} accounts in {seconds:.1f} s, {size:.1f} MB each, {k} hashes".format(
+            count=count, seconds=time.perf_counter() - start,
+            size=len(filters['username'].bits) / 1024 / 1024, k=filters['username'].hash_count,
+        ))
+
+        probes = ["{prefix}free_{id}".format(prefix=PREFIX, id=uuid.uuid4().hex) for _ in range(options['probes'])]
+        false_positives = sum(1 for name in probes if name in filters['username'])
+        self.stdout.write("False positive rate: {rate:.3%} over {probes} free usernames".format(
+            rate=false_positives / len(probes), probes=len(probes),
+        ))
+
+        taken = list(Account.objects.order_by().values_list('username', flat=True)[:options['repeat']])
+        free = probes[:options['repeat']]
+        for label, names in (("free", free), ("taken", taken)):
+            database = self.time(lambda name: set(Account.objects.taken('username', [name.lower()])), names)
+            filtered = self.time(lambda name: availability_index.taken('username', [name.lower()]), names)
+            self.stdout.write("{label} username: database {database:.3f} ms, filter first {filtered:.3f} ms".format(
+                label=label, database=database, filtered=filtered,
+            ))
+
+    @staticmethod
+    def time(check, names):
+        """
+        Average milliseconds per checked name.
+        """
+        start = time.perf_counter()
+        for name in names:
+            check(name)
+        return (time.perf_counter() - start) * 1000 / max(len(names), 1)
+
+    def seed(self, count, batch_size):
+        # Seeded accounts cannot log in, one hash is shared by all of them.
+        password = make_password(None)
+        offset = Account.objects.filter(username__startswith=PREFIX).count()
+
+        created = 0
+        while created < count:
+            accounts = []
+            for i in range(offset + created, offset + created + min(batch_size, count - created)):
+                accounts.append(Account(
+                    username="{prefix}{i}".format(prefix=PREFIX, i=i),
+                    email="{prefix}{i}@example.com".format(prefix=PREFIX, i=i),
+                    password=password,
+                ))
+            Account.objects.bulk_create(accounts, batch_size=batch_size)
+            created += len(accounts)
+            self.stdout.write("Seeded {created}/{count} accounts".format(created=created, count=count))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from account.models import Account
+from account.views import ObtainAuthTokenView
+
+USERNAME = 'login_benchmark'
+PASSWORD = 'login-benchmark-password'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measures the CPU time, wall time and queries of a login with the configured password hasher."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help="Number of logins to time.")
+
+    def handle(self, *args, **options):
+        # Everything runs in a transaction that is rolled back, so the
+        # benchmark account never outlives the command.
+        try:
+            with transaction.atomic():
+                self.benchmark(options['logins'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def benchmark(self, logins):
+        account = Account.objects.create_user("Login", "Benchmark", "login_benchmark@example.com", USERNAME, PASSWORD)
+        account.is_valid = True
+        account.save()
+
+        view = ObtainAuthTokenView.as_view()
+        factory = APIRequestFactory()
+
+        # Warm up imports and the first token.
+        self.login(view, factory)
+
+        cpu = wall = queries = 0
+        for _ in range(logins):
+            with CaptureQueriesContext(connection) as captured:
+                cpu_start, wall_start = time.process_time(), time.perf_counter()
+                self.login(view, factory)
+                cpu += time.process_time() - cpu_start
+                wall += time.perf_counter() - wall_start
+            queries += len(captured.captured_queries)
+
+        self.stdout.write("Per login over {logins} logins: {cpu:.1f} ms CPU, {wall:.1f} ms wall, {queries:.1f} queries".format(
+            logins=logins, cpu=cpu * 1000 / logins, wall=wall * 1000 / logins, queries=queries / logins,
+        ))
+
+    @staticmethod
+    def login(view, factory):
+        request = factory.post('/account/login/', {'username': USERNAME, 'password': PASSWORD}, format='json')
+        response = view(request)
+        assert response.status_code == 200, response.data
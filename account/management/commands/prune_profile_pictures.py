@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from account.models import ProfilePicture
+
+
+class Command(BaseCommand):
+    help = "Deletes profile pictures that were replaced by a newer upload, together with their stored images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Number of pictures deleted per transaction.",
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help="Only delete pictures uploaded at least this many seconds ago.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        superseded = ProfilePicture.objects.filter(
+            user__profile_picture__isnull=False,
+            uploaded_at__lt=timezone.now() - timedelta(seconds=options['min_age']),
+        ).exclude(
+            pk=F('user__profile_picture'),
+        ).order_by('uploaded_at')
+
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                batch = list(superseded.values_list('pk', flat=True)[:batch_size])
+                if batch:
+                    # The images are removed from storage once each batch commits.
+                    ProfilePicture.objects.filter(pk__in=batch).delete()
+            deleted += len(batch)
+
+            if len(batch) < batch_size:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            "Deleted {count} superseded profile pictures.".format(count=deleted)
+        ))
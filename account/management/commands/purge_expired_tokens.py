@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.models import ExpiringToken
+
+
+class Command(BaseCommand):
+    help = "Deletes expired authentication tokens in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of tokens deleted per statement.",
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help="Seconds to wait between batches, to leave room for other writes.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        deleted = 0
+        while True:
+            purged = ExpiringToken.objects.purge_expired(batch_size)
+            deleted += purged
+            if purged < batch_size:
+                break
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            "Deleted {count} expired tokens.".format(count=deleted)
+        ))
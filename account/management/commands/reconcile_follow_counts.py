@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from account.models import Account
+
+
+class Command(BaseCommand):
+    help = "Recomputes the denormalized follower and following counters of every account from the follows table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of accounts updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        account_ids = Account.objects.order_by('pk').values_list('pk', flat=True)
+
+        batch = []
+        updated = 0
+        for account_id in account_ids.iterator(chunk_size=batch_size):
+            batch.append(account_id)
+            if len(batch) >= batch_size:
+                updated += Account.objects.filter(pk__in=batch).reconcile_follow_counts()
+                batch = []
+        if batch:
+            updated += Account.objects.filter(pk__in=batch).reconcile_follow_counts()
+
+        self.stdout.write(self.style.SUCCESS(
+            "Reconciled follow counts of {count} accounts.".format(count=updated)
+        ))
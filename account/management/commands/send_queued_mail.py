@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from account.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = "Sends the queued outbound emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_QUEUE_BATCH_SIZE,
+            help="Number of messages sent per SMTP connection.",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling the queue instead of exiting once it is drained.",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help="Seconds to wait between polls of an empty queue with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            sent, retried, dead = OutboundEmail.objects.send_batch(batch_size)
+            if sent or retried or dead:
+                self.stdout.write("Sent {sent}, retrying {retried}, dead {dead}.".format(
+                    sent=sent, retried=retried, dead=dead,
+                ))
+
+            if sent + retried + dead < batch_size:
+                if not options['loop']:
+                    break
+                close_old_connections()
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Mail queue drained."))
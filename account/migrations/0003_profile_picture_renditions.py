@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_auto_20210721_1035'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilepicture',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Picture Height'),
+        ),
+        migrations.AddField(
+            model_name='profilepicture',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Picture Renditions'),
+        ),
+        migrations.AddField(
+            model_name='profilepicture',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Picture Width'),
+        ),
+    ]
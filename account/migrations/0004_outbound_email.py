@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:58
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_profile_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Subject')),
+                ('recipients', models.JSONField(default=list, verbose_name='Recipients')),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='From Email')),
+                ('body', models.TextField(blank=True, verbose_name='Body')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML Body')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Attempt At')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent At')),
+            ],
+            options={
+                'verbose_name': 'Outbound Email',
+                'verbose_name_plural': 'Outbound Emails',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='account_outbound_email_due_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:30
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fold_follow_relations(apps, schema_editor):
+    """
+    Both M2M tables described the same edges, one from each end. Every row of
+    either becomes one Follow.
+    """
+    Account = apps.get_model('account', 'Account')
+    Follow = apps.get_model('account', 'Follow')
+
+    edges = (
+        # user.following.add(followee): from_account follows to_account.
+        Account.following.through.objects.values_list('from_account_id', 'to_account_id'),
+        # user.followers.add(follower): to_account follows from_account.
+        Account.followers.through.objects.values_list('to_account_id', 'from_account_id'),
+    )
+
+    for queryset in edges:
+        batch = []
+        for follower_id, followee_id in queryset.iterator():
+            batch.append(Follow(follower_id=follower_id, followee_id=followee_id))
+            if len(batch) >= 1000:
+                Follow.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def unfold_follow_relations(apps, schema_editor):
+    Account = apps.get_model('account', 'Account')
+    Follow = apps.get_model('account', 'Follow')
+
+    following = Account.following.through
+    followers = Account.followers.through
+    for follower_id, followee_id in Follow.objects.values_list('follower_id', 'followee_id').iterator():
+        following.objects.get_or_create(from_account_id=follower_id, to_account_id=followee_id)
+        followers.objects.get_or_create(from_account_id=followee_id, to_account_id=follower_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('followee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_follows', to=settings.AUTH_USER_MODEL, verbose_name='Followee')),
+                ('follower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_follows', to=settings.AUTH_USER_MODEL, verbose_name='Follower')),
+            ],
+            options={
+                'verbose_name': 'Follow',
+                'verbose_name_plural': 'Follows',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', 'created_at'], name='account_follow_followee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', 'created_at'], name='account_follow_follower_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'followee'), name='account_follow_unique'),
+        ),
+        migrations.RunPython(fold_follow_relations, unfold_follow_relations),
+    ]
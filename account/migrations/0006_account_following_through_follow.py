@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_follow'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='account',
+            name='followers',
+        ),
+        # An M2M field cannot be switched to a through model in place.
+        migrations.RemoveField(
+            model_name='account',
+            name='following',
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='following',
+            field=models.ManyToManyField(blank=True, related_name='followers', through='account.Follow', to=settings.AUTH_USER_MODEL, verbose_name='Following'),
+        ),
+    ]
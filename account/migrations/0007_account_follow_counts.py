@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_follow_counts(apps, schema_editor):
+    Account = apps.get_model('account', 'Account')
+    Follow = apps.get_model('account', 'Follow')
+
+    def count(field):
+        return Coalesce(Subquery(
+            Follow.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(count=Count('*')).values('count')
+        ), 0)
+
+    Account.objects.update(follower_count=count('followee'), following_count=count('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_account_following_through_follow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Follower Count'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Following Count'),
+        ),
+        migrations.RunPython(populate_follow_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:05
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_account_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='account_username_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='account_email_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:26
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def point_to_latest_pictures(apps, schema_editor):
+    Account = apps.get_model('account', 'Account')
+    ProfilePicture = apps.get_model('account', 'ProfilePicture')
+
+    latest = ProfilePicture.objects.filter(user=OuterRef('pk')).order_by('-uploaded_at').values('pk')[:1]
+    Account.objects.update(profile_picture=Subquery(latest))
+
+    accounts = Account.objects.filter(profile_picture__isnull=False).select_related('profile_picture')
+    for account in accounts.iterator(chunk_size=1000):
+        image = account.profile_picture.image
+        Account.objects.filter(pk=account.pk).update(profile_picture_url=image.url if image else '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0008_account_lower_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='profile_picture',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='account.profilepicture', verbose_name='Profile Picture'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='profile_picture_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, verbose_name='Profile Picture URL'),
+        ),
+        migrations.AddIndex(
+            model_name='profilepicture',
+            index=models.Index(fields=['user', 'uploaded_at'], name='account_picture_user_idx'),
+        ),
+        migrations.RunPython(point_to_latest_pictures, migrations.RunPython.noop),
+    ]
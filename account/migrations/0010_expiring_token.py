@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:29
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_authtoken_tokens(apps, schema_editor):
+    # rest_framework.authtoken is no longer installed, its table is read
+    # directly when it exists.
+    connection = schema_editor.connection
+    if 'authtoken_token' not in connection.introspection.table_names():
+        return
+
+    ExpiringToken = apps.get_model('account', 'ExpiringToken')
+    lifetime = timedelta(seconds=settings.TOKEN_EXPIRED_AFTER_SECONDS)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT {key}, user_id, created FROM authtoken_token'.format(
+            key=connection.ops.quote_name('key'),
+        ))
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+
+            tokens = []
+            for key, user_id, created in rows:
+                if isinstance(created, str):
+                    created = parse_datetime(created)
+                if settings.USE_TZ and timezone.is_naive(created):
+                    created = timezone.make_aware(created, timezone.utc)
+                tokens.append(ExpiringToken(key=key, user_id=user_id, created=created, expires_at=created + lifetime))
+            ExpiringToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0009_profile_picture_pointer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiringToken',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='auth_token', serialize=False, to='account.account', verbose_name='User')),
+                ('key', models.CharField(max_length=40, unique=True, verbose_name='Key')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+            ],
+            options={
+                'verbose_name': 'Token',
+                'verbose_name_plural': 'Tokens',
+            },
+        ),
+        migrations.RunPython(copy_authtoken_tokens, migrations.RunPython.noop),
+        # The copied table still references account_account, which would
+        # keep the accounts it has tokens for from being deleted.
+        migrations.RunSQL('DROP TABLE IF EXISTS authtoken_token', migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0010_expiring_token'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='account',
+            name='profile_picture_url',
+        ),
+    ]
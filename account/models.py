@@ -1,17 +1,53 @@
+import binascii
 import os
+import smtplib
 import uuid
+from contextlib import suppress
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
-from django.core.mail import send_mail
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Lower
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
-from rest_framework.authtoken.models import Token
 
+from account.availability import FIELDS as AVAILABILITY_FIELDS, availability_index
+from account.cards import user_cards
+from account.utils import token_cache
+from blogapi import renditions
 
-class MyAccountManager(BaseUserManager):
+
+class AccountQuerySet(models.QuerySet):
+    def taken(self, field, values):
+        """
+        Returns which of the lowercase `values` are used by an account in
+        `field`, compared through the Lower() index of the field.
+        """
+        return self.annotate(
+            normalized=Lower(field)
+        ).filter(normalized__in=values).values_list('normalized', flat=True)
+
+    def reconcile_follow_counts(self):
+        """
+        Recomputes the denormalized follower_count and following_count of
+        every account in the queryset from the Follow table in a single UPDATE.
+        """
+        def count(field):
+            return Coalesce(Subquery(
+                Follow.objects.filter(
+                    **{field: OuterRef('pk')}
+                ).order_by().values(field).annotate(count=Count('*')).values('count')
+            ), 0)
+
+        return self.update(follower_count=count('followee'), following_count=count('follower'))
+
+
+class MyAccountManager(BaseUserManager.from_queryset(AccountQuerySet)):
     def create_user(self, first_name, last_name, email, username, password=None):
         if not email:
             raise ValueError('Users must have an email address')
@@ -98,18 +134,34 @@ class Account(AbstractBaseUser):
         null=True,
         verbose_name=_("About")
     )
-    followers = models.ManyToManyField(
-        settings.AUTH_USER_MODEL,
-        related_name=_("account_followers"),
-        blank=True,
-        verbose_name=_("Followers"),
-    )
     following = models.ManyToManyField(
-        settings.AUTH_USER_MODEL,
-        related_name=_("account_following"),
+        'self',
+        through='Follow',
+        through_fields=('follower', 'followee'),
+        symmetrical=False,
+        related_name=_("followers"),
         blank=True,
         verbose_name=_("Following"),
     )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Follower Count"),
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Following Count"),
+    )
+    profile_picture = models.ForeignKey(
+        'ProfilePicture',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name=_("+"),
+        verbose_name=_("Profile Picture"),
+    )
     account_type = models.CharField(
         max_length=10,
         default=_("public"),
@@ -157,9 +209,46 @@ class Account(AbstractBaseUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        account = super().from_db(db, field_names, values)
+        account._loaded_values = dict(zip(field_names, values))
+        return account
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Accounts rebuilt by the token cache have most fields deferred; the
+        # first one read loads them all instead of one query per field.
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields)
+        self._remember_values(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_values(kwargs.get('update_fields'))
+
+    def _remember_values(self, fields=None):
+        if fields is None:
+            fields = [field.attname for field in self._meta.concrete_fields if field.attname in self.__dict__]
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        loaded.update((name, self.__dict__[name]) for name in fields)
+
+    def has_changed(self, *field_names):
+        """
+        Whether any of `field_names` differs from its value in the database
+        as last loaded or saved. Fields never loaded count as changed.
+        """
+        loaded = getattr(self, '_loaded_values', {})
+        return any(name not in loaded or loaded[name] != getattr(self, name) for name in field_names)
+
     class Meta:
         verbose_name = _("User")
         verbose_name_plural = _("All Users")
+        indexes = [
+            models.Index(Lower('username'), name='account_username_lower_idx'),
+            models.Index(Lower('email'), name='account_email_lower_idx'),
+        ]
 
     # For checking permissions. to keep it simple all admin have ALL permissions
     def has_perm(self, perm, obj=None):
@@ -173,10 +262,245 @@ class Account(AbstractBaseUser):
         send_mail(subject, message, from_email, [self.email], **kwargs)
 
 
+class ExpiringTokenManager(models.Manager):
+    def issue(self, user):
+        """
+        Returns a valid token for `user`, whose `auth_token` should already be
+        loaded with select_related. Costs at most one statement: an expired
+        token gets a new key, a valid one is renewed when due.
+        """
+        try:
+            token = user.auth_token
+        except ExpiringToken.DoesNotExist:
+            return self.create(user=user)
+
+        if token.is_expired():
+            self.rotate(token)
+        else:
+            self.renew(token)
+        return token
+
+    def rotate(self, token):
+        """
+        Gives `token` a new key and a full lifetime, updating its row in place.
+        """
+        old_key = token.key
+        token.key = token.generate_key()
+        token.created = timezone.now()
+        token.expires_at = token.created + token.lifetime()
+
+        if not self.filter(user_id=token.user_id).update(
+            key=token.key, created=token.created, expires_at=token.expires_at,
+        ):
+            self.create(user_id=token.user_id, key=token.key, created=token.created, expires_at=token.expires_at)
+        transaction.on_commit(lambda: token_cache.invalidate(old_key, token.user_id))
+        return token
+
+    def renew(self, token):
+        """
+        Extends `token` to a full lifetime from now, at most once every
+        TOKEN_RENEW_AFTER_SECONDS. Returns whether it was extended.
+        """
+        now = timezone.now()
+        renew_before = now + token.lifetime() - timedelta(seconds=settings.TOKEN_RENEW_AFTER_SECONDS)
+        if token.expires_at > renew_before:
+            return False
+
+        token.expires_at = now + token.lifetime()
+        # Another process may have renewed it already, the filter keeps that
+        # from costing more than the check.
+        self.filter(pk=token.pk, expires_at__lte=renew_before).update(expires_at=token.expires_at)
+        return True
+
+    def purge_expired(self, batch_size):
+        """
+        Deletes up to `batch_size` expired tokens. Returns how many were
+        deleted.
+        """
+        expired = list(self.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if expired:
+            self.filter(pk__in=expired).delete()
+        return len(expired)
+
+
+class ExpiringToken(models.Model):
+    """
+    An authentication token whose expiry is stored on its row.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name=_("auth_token"),
+        verbose_name=_("User"),
+    )
+    key = models.CharField(
+        max_length=40,
+        unique=True,
+        verbose_name=_("Key"),
+    )
+    created = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("Created"),
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name=_("Expires At"),
+    )
+
+    objects = ExpiringTokenManager()
+
+    class Meta:
+        verbose_name = _("Token")
+        verbose_name_plural = _("Tokens")
+
+    def __str__(self):
+        return self.key
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        if self.expires_at is None:
+            self.expires_at = self.created + self.lifetime()
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def generate_key():
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    @staticmethod
+    def lifetime():
+        return timedelta(seconds=settings.TOKEN_EXPIRED_AFTER_SECONDS)
+
+    def expires_in(self):
+        return self.expires_at - timezone.now()
+
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def create_auth_token(sender, instance, created=False, **kwargs):
-    if created:
-        Token.objects.create(user=instance)
+def create_auth_token(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        ExpiringToken.objects.create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_token(sender, instance, created=False, **kwargs):
+    # The cached copy of the user must not outlive a deactivation. Deferred
+    # so that a concurrent request cannot cache the user again from the row
+    # as it was before the commit.
+    if not created:
+        transaction.on_commit(lambda: token_cache.invalidate_user(instance.pk))
+
+
+def invalidate_cached_card(user_id):
+    # Deferred so that a concurrent read cannot cache the card again from
+    # the rows as they were before the commit.
+    transaction.on_commit(lambda: user_cards.invalidate(user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_card(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        invalidate_cached_card(instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def remember_taken_names(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        availability_index.remember(instance, [
+            field for field in AVAILABILITY_FIELDS if created or instance.has_changed(field)
+        ])
+
+
+@receiver(post_save, sender=ExpiringToken)
+@receiver(post_delete, sender=ExpiringToken)
+def invalidate_cached_token(sender, instance, **kwargs):
+    transaction.on_commit(lambda: token_cache.invalidate(instance.key, instance.user_id))
+
+
+class FollowManager(models.Manager):
+    def toggle(self, follower, followee):
+        """
+        Follows `followee` if `follower` does not follow them yet, unfollows
+        them otherwise. Returns whether `follower` follows `followee` now.
+        """
+        with transaction.atomic():
+            follow = self.filter(follower=follower, followee=followee).first()
+            if follow is not None:
+                follow.delete()
+                return False
+
+            try:
+                with transaction.atomic():
+                    self.create(follower=follower, followee=followee)
+            except IntegrityError:
+                # Followed concurrently.
+                pass
+            return True
+
+    def is_following(self, follower, followee):
+        return self.filter(follower=follower, followee=followee).exists()
+
+
+class Follow(models.Model):
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        primary_key=True,
+        editable=False,
+        auto_created=True,
+        verbose_name=_("ID"),
+    )
+    follower = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("outgoing_follows"),
+        verbose_name=_("Follower")
+    )
+    followee = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("incoming_follows"),
+        verbose_name=_("Followee")
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("Created At")
+    )
+
+    objects = FollowManager()
+
+    class Meta:
+        verbose_name = _("Follow")
+        verbose_name_plural = _("Follows")
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='account_follow_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['followee', 'created_at'], name='account_follow_followee_idx'),
+            models.Index(fields=['follower', 'created_at'], name='account_follow_follower_idx'),
+        ]
+
+    def __str__(self):
+        return "{follower} -> {followee}".format(follower=self.follower_id, followee=self.followee_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        Account.objects.filter(pk=instance.follower_id).update(following_count=F('following_count') + 1)
+        Account.objects.filter(pk=instance.followee_id).update(follower_count=F('follower_count') + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    Account.objects.filter(
+        pk=instance.follower_id, following_count__gt=0
+    ).update(following_count=F('following_count') - 1)
+    Account.objects.filter(
+        pk=instance.followee_id, follower_count__gt=0
+    ).update(follower_count=F('follower_count') - 1)
 
 
 def image_path(instance, filename):
@@ -208,6 +532,24 @@ class ProfilePicture(models.Model):
         blank=True,
         verbose_name=_('Picture'),
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Picture Width")
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Picture Height")
+    )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name=_("Picture Renditions")
+    )
 
     uploaded_at = models.DateTimeField(
         auto_now=True,
@@ -223,6 +565,241 @@ class ProfilePicture(models.Model):
     class Meta:
         verbose_name = _("Profile Picture")
         verbose_name_plural = _("Profile Pictures")
+        indexes = [
+            models.Index(fields=['user', 'uploaded_at'], name='account_picture_user_idx'),
+        ]
 
     def __str__(self):
         return self.image.name
+
+
+@receiver(pre_save, sender=ProfilePicture)
+def profile_picture_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        renditions.prepare(instance)
+
+
+@receiver(post_save, sender=ProfilePicture)
+def profile_picture_post_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created and instance.user_id is not None:
+        # A new upload becomes the current picture of its user.
+        Account.objects.filter(pk=instance.user_id).update(profile_picture=instance)
+    if instance.user_id is not None:
+        invalidate_cached_card(instance.user_id)
+
+    renditions.schedule(instance, on_generated=invalidate_cached_picture)
+
+
+def invalidate_cached_picture(profile_picture):
+    invalidate_cached_card(profile_picture.user_id)
+
+
+@receiver(post_delete, sender=ProfilePicture)
+def profile_picture_post_delete(sender, instance, **kwargs):
+    # Deferred so that storage is only touched once the deletion is committed.
+    def delete_image():
+        renditions.delete_renditions(instance.image, instance.image_renditions)
+        instance.image.delete(False)
+
+    transaction.on_commit(delete_image)
+
+    # Deleting the current picture cleared the pointer, the previous upload
+    # takes its place.
+    account = Account.objects.filter(pk=instance.user_id, profile_picture__isnull=True).first()
+    if account is None:
+        return
+
+    latest = ProfilePicture.objects.filter(user=account).order_by('-uploaded_at').first()
+    Account.objects.filter(pk=account.pk).update(profile_picture=latest)
+    invalidate_cached_card(account.pk)
+
+
+class OutboundEmailManager(models.Manager):
+    def enqueue(self, subject, recipients, body='', html_body='', from_email=None):
+        """
+        Queues a message for `send_queued_mail`. Call it inside the
+        transaction that creates whatever the message is about, so that
+        neither exists without the other.
+        """
+        return self.create(
+            subject=subject,
+            recipients=list(recipients),
+            body=body,
+            html_body=html_body or '',
+            from_email=from_email or '',
+        )
+
+    def claim(self, batch_size):
+        """
+        Takes up to `batch_size` due messages, oldest first, and holds them
+        for EMAIL_QUEUE_LEASE seconds so that concurrent workers skip them.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            messages = list(
+                self.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')
+                .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)[:batch_size]
+            )
+            self.filter(pk__in=[message.pk for message in messages]).update(
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_QUEUE_LEASE)
+            )
+        return messages
+
+    def send_batch(self, batch_size):
+        """
+        Sends one batch of due messages over a single SMTP connection.
+        Returns the number of messages sent, retried and given up on.
+        """
+        messages = self.claim(batch_size)
+        sent = retried = dead = 0
+        if not messages:
+            return sent, retried, dead
+
+        mail_connection = get_connection(
+            username=settings.EMAIL_HOST_USER,
+            password=settings.EMAIL_HOST_PASSWORD,
+        )
+        try:
+            for message in messages:
+                try:
+                    mail_connection.send_messages([message.as_email_message(mail_connection)])
+                except (smtplib.SMTPException, OSError) as exc:
+                    # A failed message may have left the connection unusable,
+                    # the next send reopens it.
+                    with suppress(smtplib.SMTPException, OSError):
+                        mail_connection.close()
+                    if message.mark_failed(exc) == OutboundEmail.DEAD:
+                        dead += 1
+                    else:
+                        retried += 1
+                else:
+                    message.mark_sent()
+                    sent += 1
+        finally:
+            with suppress(smtplib.SMTPException, OSError):
+                mail_connection.close()
+
+        return sent, retried, dead
+
+
+class OutboundEmail(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (PENDING, _("Pending")),
+        (SENT, _("Sent")),
+        (DEAD, _("Dead")),
+    )
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        primary_key=True,
+        editable=False,
+        auto_created=True,
+        verbose_name=_("ID"),
+    )
+    subject = models.CharField(
+        max_length=255,
+        verbose_name=_("Subject")
+    )
+    recipients = models.JSONField(
+        default=list,
+        verbose_name=_("Recipients")
+    )
+    from_email = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_("From Email")
+    )
+    body = models.TextField(
+        blank=True,
+        verbose_name=_("Body")
+    )
+    html_body = models.TextField(
+        blank=True,
+        verbose_name=_("HTML Body")
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name=_("Status")
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Attempts")
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("Next Attempt At")
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name=_("Last Error")
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("Created At")
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Sent At")
+    )
+
+    objects = OutboundEmailManager()
+
+    class Meta:
+        verbose_name = _("Outbound Email")
+        verbose_name_plural = _("Outbound Emails")
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='account_outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return self.subject
+
+    def as_email_message(self, mail_connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=self.recipients,
+            connection=mail_connection,
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+    def mark_sent(self):
+        self.status = OutboundEmail.SENT
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ''
+        self.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+
+    def mark_failed(self, exc):
+        """
+        Records a failed attempt and schedules the next one with exponential
+        backoff, or gives up after EMAIL_QUEUE_MAX_ATTEMPTS attempts.
+        """
+        self.attempts += 1
+        self.last_error = "{name}: {exc}".format(name=type(exc).__name__, exc=exc)
+        if self.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            self.status = OutboundEmail.DEAD
+        else:
+            delay = settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+        return self.status
+
+    def requeue(self):
+        self.status = OutboundEmail.PENDING
+        self.attempts = 0
+        self.next_attempt_at = timezone.now()
+        self.save(update_fields=['status', 'attempts', 'next_attempt_at'])
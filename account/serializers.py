@@ -1,6 +1,8 @@
 import secrets
 
+from django.db.models import Manager
 from rest_framework.serializers import (
+    ListSerializer,
     ModelSerializer,
     CharField,
     ValidationError,
@@ -8,7 +10,9 @@ from rest_framework.serializers import (
     SerializerMethodField,
 )
 
+from account.cards import user_cards
 from account.models import Account, ProfilePicture
+from blogapi import renditions
 
 
 class RegistrationSerializer(ModelSerializer):
@@ -35,8 +39,11 @@ class RegistrationSerializer(ModelSerializer):
 
         return data
 
-    def save(self, **kwargs):
-
+    def save(self, commit=True, **kwargs):
+        """
+        Creates the account. With `commit=False` it is returned unsaved, for
+        the caller to save along with whatever goes with it.
+        """
         first_name = self.validated_data["first_name"]
         last_name = self.validated_data["last_name"]
         email = self.validated_data["email"]
@@ -58,7 +65,8 @@ class RegistrationSerializer(ModelSerializer):
                 "message": "Password doesn't matched."
             })
         account.set_password(password)
-        account.save()
+        if commit:
+            account.save()
         return account
 
 
@@ -68,9 +76,16 @@ class LoginSerializer(Serializer):
 
 
 class ProfilePictureSerializer(ModelSerializer):
+    image_renditions = SerializerMethodField()
+
     class Meta:
         model = ProfilePicture
-        fields = ['image']
+        fields = ['image', 'image_width', 'image_height', 'image_renditions']
+
+    def get_image_renditions(self, obj):
+        if not obj:
+            return {}
+        return renditions.rendition_urls(obj.image, obj.image_renditions, self.context.get('request'))
 
 
 class ProfilePictureUploadSerializer(ModelSerializer):
@@ -106,18 +121,46 @@ class AccountDetailSerializer(ModelSerializer):
         model = Account
         fields = [
             'id', 'first_name', 'last_name', 'phone', 'username', 'email', 'about',
-            'dob', 'gender', "followers", "following", 'profile_picture', 'account_type'
+            'dob', 'gender', "follower_count", "following_count", 'profile_picture', 'account_type'
         ]
 
     def get_profile_picture(self, obj):
-        try:
-            image = ProfilePicture.objects.filter(user=obj.id).order_by('-uploaded_at')[0]
-        except (ProfilePicture.DoesNotExist, IndexError):
-            image = ""
+        card = self.context.get('card') or user_cards.get(obj.pk)
+        return card.profile_picture()
+
+
+class AccountCardListSerializer(ListSerializer):
+    """
+    Fetches the cards of a whole list of accounts at once.
+    """
+
+    def to_representation(self, data):
+        accounts = list(data.all() if isinstance(data, Manager) else data)
+        self.context['cards'] = user_cards.get_many(account.pk for account in accounts)
+        return super().to_representation(accounts)
+
+
+class AccountCardSerializer(Serializer):
+    """
+    Compact user card for lists of accounts, rendered from their cached
+    user card. Only the primary key of the accounts is read.
+    """
+
+    class Meta:
+        list_serializer_class = AccountCardListSerializer
 
-        serializer = ProfilePictureSerializer(image)
+    def to_representation(self, account):
+        cards = self.context.get('cards')
+        if cards is None or account.pk not in cards:
+            cards = user_cards.get_many([account.pk])
+        card = cards[account.pk]
 
-        return serializer.data
+        return {
+            'id': str(card.id),
+            'username': card.username,
+            'name': card.full_name,
+            'avatar_url': card.profile_picture(self.context.get('request'))['image'],
+        }
 
 
 class AccountPropertiesSerializer(ModelSerializer):
@@ -125,7 +168,7 @@ class AccountPropertiesSerializer(ModelSerializer):
         model = Account
         fields = [
             "first_name", "last_name", "phone", "dob", 'gender',
-            "account_type", "timestamp", "followers", "following", "about"
+            "account_type", "follower_count", "following_count", "about"
         ]
 
     # def validate(self, account):
@@ -0,0 +1,150 @@
+import smtplib
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from account.cards import user_cards
+from account.models import Account, ExpiringToken, OutboundEmail, ProfilePicture
+from account.utils import token_cache
+
+REGISTRATION = {
+    'first_name': "Ada",
+    'last_name': "Lovelace",
+    'email': "ada@example.com",
+    'username': "ada",
+    'password': "analytical-engine",
+    'password2': "analytical-engine",
+}
+
+
+class AccountTests(TestCase):
+    def test_changes_are_tracked_from_the_last_load_or_save(self):
+        Account.objects.create_user("First", "Last", "writer@example.com", "writer", "password")
+        account = Account.objects.get(username="writer")
+
+        account.first_name = "Second"
+        self.assertTrue(account.has_changed('first_name'))
+        self.assertFalse(account.has_changed('username'))
+
+        account.save()
+        self.assertFalse(account.has_changed('first_name'))
+
+
+class TokenCacheTests(TestCase):
+    def test_deactivation_reaches_local_copies_once_committed(self):
+        account = Account.objects.create_user("Ada", "Lovelace", "ada@example.com", "ada", "password")
+        token = ExpiringToken.objects.select_related('user').get(user=account)
+        token_cache.set(token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            account.is_active = False
+            account.save()
+            self.assertIsNotNone(token_cache.get(token.key))
+
+        # The local copy of the token is left, its user is not.
+        self.assertIn(token.key, token_cache._local)
+        self.assertIsNone(token_cache.get(token.key))
+
+
+class UserCardTests(TestCase):
+    def test_full_name_leaves_out_missing_names(self):
+        account = Account.objects.create_user("Ada", "Lovelace", "ada@example.com", "ada", "password")
+        self.assertEqual(user_cards.get(account.pk).full_name, "Ada Lovelace")
+
+        Account.objects.filter(pk=account.pk).update(first_name=None)
+        user_cards.invalidate(account.pk)
+        self.assertEqual(user_cards.get(account.pk).full_name, "Lovelace")
+
+        Account.objects.filter(pk=account.pk).update(last_name=None)
+        user_cards.invalidate(account.pk)
+        self.assertEqual(user_cards.get(account.pk).full_name, "")
+
+    def test_picture_urls_are_built_when_rendered(self):
+        account = Account.objects.create_user("Ada", "Lovelace", "ada@example.com", "ada", "password")
+        picture = ProfilePicture.objects.create(user=account, image='profile_pictures/ada.png')
+        ProfilePicture.objects.filter(pk=picture.pk).update(image_renditions={'small': 'profile_pictures/ada_small.jpg'})
+        user_cards.invalidate(account.pk)
+
+        card = user_cards.get(account.pk)
+        self.assertEqual(card.image, 'profile_pictures/ada.png')
+
+        storage = ProfilePicture._meta.get_field('image').storage
+        with mock.patch.object(storage, 'url', side_effect=lambda name: "/signed/" + name):
+            self.assertEqual(card.profile_picture(), {
+                'image': "/signed/profile_pictures/ada.png",
+                'image_width': None,
+                'image_height': None,
+                'image_renditions': {'small': "/signed/profile_pictures/ada_small.jpg"},
+            })
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class RegistrationEmailTests(TestCase):
+    def test_registration_queues_the_verification_email(self):
+        response = self.client.post(reverse('register'), REGISTRATION)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['mail_response'], 'queued')
+        account = Account.objects.get(username="ada")
+        message = OutboundEmail.objects.get()
+        self.assertEqual(message.recipients, [account.email])
+        self.assertEqual(message.status, OutboundEmail.PENDING)
+        # Nothing is sent on the request path.
+        self.assertEqual(mail.outbox, [])
+
+    def test_account_is_not_created_when_the_email_cannot_be_queued(self):
+        with mock.patch.object(OutboundEmail.objects, 'enqueue', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('register'), REGISTRATION)
+
+        self.assertFalse(Account.objects.filter(username="ada").exists())
+
+    def test_queued_email_is_sent_by_the_worker(self):
+        self.client.post(reverse('register'), REGISTRATION)
+
+        self.assertEqual(OutboundEmail.objects.send_batch(10), (1, 0, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["ada@example.com"])
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.SENT)
+        self.assertEqual(OutboundEmail.objects.send_batch(10), (0, 0, 0))
+
+
+@override_settings(
+    EMAIL_BACKEND='account.tests.FailingEmailBackend',
+    EMAIL_QUEUE_MAX_ATTEMPTS=2,
+    EMAIL_QUEUE_RETRY_DELAY=60,
+)
+class OutboundEmailRetryTests(TestCase):
+    def setUp(self):
+        self.message = OutboundEmail.objects.enqueue("Subject", ["someone@example.com"], body="Body")
+
+    def test_failed_message_is_retried_with_backoff(self):
+        self.assertEqual(OutboundEmail.objects.send_batch(10), (0, 1, 0))
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, OutboundEmail.PENDING)
+        self.assertEqual(self.message.attempts, 1)
+        self.assertIn("SMTPServerDisconnected", self.message.last_error)
+        self.assertGreater(self.message.next_attempt_at, timezone.now())
+        # Not due before its next attempt.
+        self.assertEqual(OutboundEmail.objects.send_batch(10), (0, 0, 0))
+
+    def test_message_is_dead_lettered_after_the_last_attempt(self):
+        OutboundEmail.objects.send_batch(10)
+        OutboundEmail.objects.filter(pk=self.message.pk).update(next_attempt_at=timezone.now())
+
+        self.assertEqual(OutboundEmail.objects.send_batch(10), (0, 0, 1))
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, OutboundEmail.DEAD)
+        self.assertEqual(self.message.attempts, 2)
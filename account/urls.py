@@ -7,10 +7,12 @@ from account.views import (
     ChangePasswordView,
     account_properties_view,
     does_account_exist_view,
+    availability_view,
     detail_user_view,
     upload_profile_picture,
     api_follow_toggle_view,
     api_check_if_following_view,
+    ApiFollowListView,
     verify_account
 )
 
@@ -19,11 +21,14 @@ urlpatterns = [
     path('login/', ObtainAuthTokenView.as_view(), name="login"),
     path('verify_account/<str:user_id>/<str:token>/', verify_account, name="account_verification"),
     path('check_if_account_exists/<user_id>/', does_account_exist_view, name="check_if_account_exists"),
+    path('availability/', availability_view, name="availability"),
     path('change_password/', ChangePasswordView.as_view(), name="change_password"),
     path('properties/', account_properties_view, name="properties"),
     path('update/', update_account_view, name='update'),
     path('details/<user_id>/', detail_user_view, name='details'),
     path('follow/<user_id>/', api_follow_toggle_view, name='follow'),
     path('is_following/<user_id>/', api_check_if_following_view, name='is_following'),
+    path('followers/<user_id>/', ApiFollowListView.as_view(relation='followers'), name='followers'),
+    path('following/<user_id>/', ApiFollowListView.as_view(relation='following'), name='following'),
     path('upload_profile_picture/', upload_profile_picture, name='upload_profile_picture'),
 ]
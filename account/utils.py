@@ -1,52 +1,168 @@
-from datetime import timedelta
+import threading
+import time
+from collections import OrderedDict
 
+from django.apps import apps
 from django.conf import settings
-from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
 
 
-# this return left time
-def expires_in(token):
-    time_elapsed = timezone.now() - token.created
-    left_time = timedelta(seconds=settings.TOKEN_EXPIRED_AFTER_SECONDS) - time_elapsed
-    return left_time
+# The only fields of a user kept in the cache. The others, its password hash
+# among them, are loaded from the database when first read.
+CACHED_USER_FIELDS = ('id', 'username', 'is_active')
 
 
-# token checker if token expired or not
-def is_token_expired(token):
-    return expires_in(token) < timedelta(seconds=0)
+def from_values(model, values):
+    """
+    An instance of `model` as loaded from the database with only the fields
+    in `values`; the others are deferred.
+    """
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+class TokenCache:
+    """
+    Resolves token keys to tokens, with their user, without a database query.
+
+    Tokens are cached in the shared cache and in a small LRU in each process,
+    never past their expiry. The CACHED_USER_FIELDS of their user are cached
+    on their own and only in the shared cache, which is read on every lookup:
+    `invalidate` and `invalidate_user` take effect in all processes at once,
+    as a token is only used while its user is cached.
+    """
+
+    def __init__(self, prefix, max_size, timeout, local_timeout):
+        self.prefix = prefix
+        self.max_size = max_size
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token_key(self, key):
+        return "{prefix}:token:{key}".format(prefix=self.prefix, key=key)
+
+    def user_key(self, user_id):
+        return "{prefix}:user:{user_id}".format(prefix=self.prefix, user_id=user_id)
+
+    @staticmethod
+    def _build(entry, user_entry):
+        # New instances per request, which may modify request.user.
+        token = from_values(apps.get_model('account', 'ExpiringToken'), entry)
+        token.user = from_values(get_user_model(), user_entry)
+        return token
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[0]
 
+    def _set_local(self, key, entry, timeout):
+        with self._lock:
+            self._local[key] = (entry, time.monotonic() + min(timeout, self.local_timeout))
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
 
-# if token is expired new token will be established
-# If token is expired then it will be removed
-# and new one with different key will be created
-def token_expire_handler(token):
-    is_expired = is_token_expired(token)
-    if is_expired:
-        token.delete()
-        token = Token.objects.create(user=token.user)
-    return is_expired, token
+    def get(self, key):
+        entry = self._get_local(key)
+        cached_locally = entry is not None
+        if not cached_locally:
+            entry = cache.get(self.token_key(key))
+            if entry is None:
+                return None
+
+        user_entry = cache.get(self.user_key(entry['user_id']))
+        if user_entry is None:
+            return None
+
+        token = self._build(entry, user_entry)
+        if not cached_locally:
+            timeout = token.expires_in().total_seconds()
+            if timeout > 0:
+                self._set_local(key, entry, timeout)
+        return token
+
+    def set(self, token):
+        """
+        Caches `token`, whose user must already be loaded.
+        """
+        timeout = min(self.timeout, token.expires_in().total_seconds())
+        if timeout <= 0:
+            return
+
+        entry = {field.attname: getattr(token, field.attname) for field in token._meta.concrete_fields}
+        cache.set_many({
+            self.token_key(token.key): entry,
+            self.user_key(token.user_id): {name: getattr(token.user, name) for name in CACHED_USER_FIELDS},
+        }, timeout=timeout)
+        self._set_local(token.key, entry, timeout)
+
+    def invalidate(self, key, user_id):
+        """
+        Drops the token `key` of `user_id`. Its user is dropped as well, so
+        that processes holding a local copy of the token stop using it.
+        """
+        cache.delete_many([self.token_key(key), self.user_key(user_id)])
+        with self._lock:
+            self._local.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        """
+        Stops all processes from using the cached tokens of `user_id` until
+        they are read from the database again.
+        """
+        cache.delete(self.user_key(user_id))
+
+
+token_cache = TokenCache(
+    'expiring_token',
+    max_size=settings.TOKEN_CACHE_SIZE,
+    timeout=settings.TOKEN_CACHE_TIMEOUT,
+    local_timeout=settings.TOKEN_CACHE_LOCAL_TIMEOUT,
+)
 
 
 class ExpiringTokenAuthentication(TokenAuthentication):
     """
-    If token is expired then it will be removed
-    and new one with different key will be created
+    Authenticates with an ExpiringToken, rejecting it once it expired and
+    renewing it while it is used.
+
+    Tokens are resolved through `token_cache`, so most requests authenticate
+    without touching the database.
     """
 
+    def get_model(self):
+        return apps.get_model('account', 'ExpiringToken')
+
     def authenticate_credentials(self, key):
-        try:
-            token = Token.objects.get(key=key)
-        except Token.DoesNotExist:
-            raise AuthenticationFailed("Invalid Token")
+        model = self.get_model()
+        token = token_cache.get(key)
+        if token is None:
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise AuthenticationFailed("Invalid Token")
+            token_cache.set(token)
 
         if not token.user.is_active:
             raise AuthenticationFailed("User is not active")
 
-        is_expired, token = token_expire_handler(token)
-        if is_expired:
+        if token.is_expired():
             raise AuthenticationFailed("The Token is expired")
 
+        if model.objects.renew(token):
+            token_cache.set(token)
+
         return token.user, token
@@ -1,33 +1,40 @@
-import smtplib
+import asyncio
+import uuid
 
 from django.conf import settings
-from django.contrib.auth import authenticate
-from django.core.mail import send_mail
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import render
 from django.template.loader import get_template
 from django.urls import reverse
 from django.utils.encoding import force_bytes, force_text
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from rest_framework.generics import UpdateAPIView
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import ListAPIView, UpdateAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from account.models import Account
+from account.availability import availability_index, normalize
+from account.cards import user_cards
+from account.models import Account, ExpiringToken, Follow, OutboundEmail
 from account.serializers import (
     RegistrationSerializer,
     AccountPropertiesSerializer,
     ChangePasswordSerializer,
     LoginSerializer,
     AccountDetailSerializer,
+    AccountCardSerializer,
     ProfilePictureUploadSerializer
 )
 from account.tokens import user_tokenizer
-from account.utils import token_expire_handler, expires_in
+from account.utils import ExpiringTokenAuthentication
+from blogapi.async_api import async_api_view, database_sync_to_async
+from blogapi.keyset import before, cursor_url, decode_cursor
 
 DOES_NOT_EXIST = "DOES_NOT_EXIST"
 EMAIL_EXISTS = "EMAIL_EXISTS"
@@ -85,34 +92,22 @@ def registration_view(request):
 
             subject = 'Confirm Your Account - NixLab'
 
-            try:
-                res = send_mail(
-                    auth_user=settings.EMAIL_HOST_USER,
-                    auth_password=settings.EMAIL_HOST_PASSWORD,
+            with transaction.atomic():
+                account.save()
+                OutboundEmail.objects.enqueue(
                     subject=subject,
-                    message='',
+                    recipients=[account.email],
+                    html_body=message,
                     from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[account.email],
-                    html_message=message
                 )
 
-                account.save()
-
-                data['response'] = "account_created"
-                data['mail_response'] = 'success'
-                data['mail_result'] = res
-                data['message'] = "Registration successful. A verification email has been sent to your email. Please " \
-                                  "verify your account to complete registration. If you don't receive an email, " \
-                                  "please make sure you've entered the address you registered with, and check your " \
-                                  "spam folder."
-                return Response(data, status=status.HTTP_201_CREATED)
-            except (smtplib.SMTPException, TimeoutError) as exc:
-                data["response"] = "error"
-                data['mail_response'] = 'error'
-                data['message'] = "An error occurred while sending verification email. Please check your email " \
-                                  "address and try again."
-                data['error'] = str(exc)
-                return Response(data, status=status.HTTP_400_BAD_REQUEST)
+            data['response'] = "account_created"
+            data['mail_response'] = 'queued'
+            data['message'] = "Registration successful. A verification email has been sent to your email. Please " \
+                              "verify your account to complete registration. If you don't receive an email, " \
+                              "please make sure you've entered the address you registered with, and check your " \
+                              "spam folder."
+            return Response(data, status=status.HTTP_201_CREATED)
 
         else:
             data["response"] = "error"
@@ -141,7 +136,7 @@ def verify_account(request, user_id, token):
 
 
 class ObtainAuthTokenView(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = []
     permission_classes = [AllowAny]
 
     def post(self, request):
@@ -153,32 +148,29 @@ class ObtainAuthTokenView(APIView):
         username = request.data.get('username', '0')
         password = request.data.get('password', '0')
 
-        if validate_username(username) is None:
+        # One fetch for the account and its token, one password check.
+        account = Account.objects.select_related('auth_token').filter(username=username).first()
+        if account is None:
             context['response'] = "error"
             context['message'] = "Your username is incorrect."
             return Response(context, status=status.HTTP_404_NOT_FOUND)
 
-        if validate_password(username, password) is False:
+        # check_password also rehashes the password when the hasher settings
+        # changed since it was set.
+        if not account.is_active or not account.check_password(password):
             context['response'] = "error"
             context['message'] = "Your password is incorrect."
             return Response(context, status=status.HTTP_404_NOT_FOUND)
 
         if serializer.is_valid():
-            account = authenticate(username=username, password=password)
-
             if account.is_valid:
-                try:
-                    token, _ = Token.objects.get_or_create(user=account)
-                except Token.DoesNotExist:
-                    token = Token.objects.create(user=account)
-
-                is_expired, token = token_expire_handler(token)
+                token = ExpiringToken.objects.issue(account)
 
                 context['response'] = "success"
                 context["message"] = "Login successful."
                 context['id'] = account.id
                 context['token'] = token.key
-                context['expires_in'] = expires_in(token)
+                context['expires_in'] = token.expires_in()
                 return Response(context, status=status.HTTP_200_OK)
             else:
                 context['response'] = "error"
@@ -188,47 +180,44 @@ class ObtainAuthTokenView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(["GET"])
-@permission_classes((IsAuthenticated,))
-def detail_user_view(request, user_id):
+@async_api_view
+async def detail_user_view(request, user_id):
     try:
-        user = Account.objects.get(id=user_id)
-    except Account.DoesNotExist:
+        user_id = uuid.UUID(user_id)
+    except ValueError:
         return Response({'response': DOES_NOT_EXIST},
                         status=status.HTTP_404_NOT_FOUND)
 
-    serializer = AccountDetailSerializer(user)
+    # The profile picture comes from the cached card, which is fetched along
+    # with the account.
+    user, card = await asyncio.gather(
+        database_sync_to_async(Account.objects.filter(id=user_id).first)(),
+        database_sync_to_async(user_cards.get)(user_id),
+    )
+    if user is None:
+        return Response({'response': DOES_NOT_EXIST},
+                        status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == "GET":
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    return Response({'response': serializer.errors, },
-                    status=status.HTTP_400_BAD_REQUEST)
+    serializer = AccountDetailSerializer(user, context={'card': card})
+    return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
 @permission_classes((IsAuthenticated,))
 def api_follow_toggle_view(request, user_id):
     try:
-        user = Account.objects.get(id=request.user.id)
         following_user = Account.objects.get(id=user_id)
-    except Account.DoesNotExist:
+    except (Account.DoesNotExist, ValidationError):
         return Response({'response': DOES_NOT_EXIST},
                         status=status.HTTP_404_NOT_FOUND)
 
     if request.user.is_authenticated:
-        if following_user in user.following.all() and request.user in following_user.followers.all():
-            user.following.remove(following_user)
-            following_user.followers.remove(request.user)
-            is_following = False
-        else:
-            user.following.add(following_user)
-            following_user.followers.add(request.user)
-            is_following = True
+        is_following = Follow.objects.toggle(request.user, following_user)
 
         updated = True
 
         data = {
-            "follower": user.username,
+            "follower": request.user.username,
             "following": following_user.username,
             "updated": updated,
             "is_following": is_following
@@ -237,25 +226,71 @@ def api_follow_toggle_view(request, user_id):
         return Response(data, status=status.HTTP_200_OK)
 
 
+class ApiFollowListView(ListAPIView):
+    """
+    Cursor-paginated user cards of the accounts on one side of `user_id`'s
+    follows, most recent follow first. `relation` is "followers" or
+    "following".
+    """
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = AccountCardSerializer
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    relation = None
+
+    def get_queryset(self):
+        try:
+            user_id = uuid.UUID(self.kwargs['user_id'])
+        except ValueError:
+            raise NotFound(DOES_NOT_EXIST)
+
+        # Each card is the account on the other end of a Follow row.
+        if self.relation == 'followers':
+            edge, lookup = 'outgoing_follows', {'outgoing_follows__followee': user_id}
+        else:
+            edge, lookup = 'incoming_follows', {'incoming_follows__follower': user_id}
+
+        return Account.objects.filter(**lookup).only('id').annotate(
+            followed_at=F(edge + '__created_at'),
+            follow_id=F(edge + '__id'),
+        )
+
+    def list(self, request, *args, **kwargs):
+        position = decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        queryset = self.get_queryset()
+        if position is not None:
+            queryset = queryset.filter(before(position, 'followed_at', 'follow_id'))
+
+        page = list(queryset.order_by('-followed_at', '-follow_id')[:self.page_size + 1])
+        has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        serializer = self.get_serializer(page, many=True)
+
+        return Response({
+            'next': cursor_url(request, (page[-1].followed_at, page[-1].follow_id),
+                               self.cursor_query_param) if has_next else None,
+            'results': serializer.data,
+        })
+
+
 @api_view(["GET"])
 @permission_classes((IsAuthenticated,))
 def api_check_if_following_view(request, user_id):
     try:
-        user = Account.objects.get(id=request.user.id)
         following_user = Account.objects.get(id=user_id)
-    except Account.DoesNotExist:
+    except (Account.DoesNotExist, ValidationError):
         return Response({'response': DOES_NOT_EXIST},
                         status=status.HTTP_404_NOT_FOUND)
 
     if request.user.is_authenticated:
-        if following_user in user.following.all() and \
-                request.user in following_user.followers.all():
-            is_following = True
-        else:
-            is_following = False
+        is_following = Follow.objects.is_following(request.user, following_user)
 
         data = {
-            "follower": user.username,
+            "follower": request.user.username,
             "following": following_user.username,
             "is_following": is_following
         }
@@ -311,6 +346,35 @@ def update_account_view(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([])
+@authentication_classes([])
+def availability_view(request):
+    """
+    Tells which of the `username` and `email` query parameters are free, e.g.
+    ?username=alice&username=bob&email=alice@example.com
+    """
+    data = {}
+    candidates = {
+        field: {value: normalize(value) for value in request.query_params.getlist(field) if value.strip()}
+        for field in ('username', 'email')
+    }
+
+    if not 0 < sum(len(values) for values in candidates.values()) <= settings.AVAILABILITY_MAX_CANDIDATES:
+        data['response'] = "error"
+        data['message'] = "Provide between 1 and {max} usernames and emails.".format(
+            max=settings.AVAILABILITY_MAX_CANDIDATES
+        )
+        return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+    for field, values in candidates.items():
+        taken = availability_index.taken(field, values.values()) if values else set()
+        data[field + 's'] = {value: normalized not in taken for value, normalized in values.items()}
+
+    data['response'] = "success"
+    return Response(data, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([])
 @authentication_classes([])
@@ -342,7 +406,7 @@ class ChangePasswordView(UpdateAPIView):
     serializer_class = ChangePasswordSerializer
     model = Account
     permission_classes = (IsAuthenticated,)
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
 
     def get_object(self, queryset=None):
         obj = self.request.user
@@ -385,30 +449,12 @@ def account_properties_view(request):
 
 
 def validate_email(email):
-    try:
-        account = Account.objects.get(email=email)
-    except Account.DoesNotExist:
-        return None
-    if account is not None:
+    if Account.objects.taken('email', [normalize(email)]).exists():
         return email
+    return None
 
 
 def validate_username(username):
-    try:
-        account = Account.objects.get(username=username)
-    except Account.DoesNotExist:
-        return None
-    if account is not None:
+    if Account.objects.taken('username', [normalize(username)]).exists():
         return username
-
-
-def validate_password(username, password):
-    try:
-        account = Account.objects.get(username=username)
-    except Account.DoesNotExist:
-        raise ValueError(DOES_NOT_EXIST)
-
-    if account.check_password(password):
-        return True
-    else:
-        return False
+    return None
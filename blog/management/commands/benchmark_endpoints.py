@@ -0,0 +1,244 @@
+import io
+import json
+import math
+import platform
+import tempfile
+import time
+import tracemalloc
+from importlib import import_module
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import URLPattern
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+
+from account.models import Account, ExpiringToken
+from account.tokens import user_tokenizer
+from blog.management.commands.seed_dataset import PASSWORD
+from blog.models import BlogPost
+from chats.models import ConversationMember
+
+# Apps whose every route has to be covered.
+URL_APPS = ('blog', 'account', 'chats', 'feeds')
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of the sorted `values`.
+    """
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def png(name):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (60, 120, 200)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class Command(BaseCommand):
+    help = "Requests every route of the blog, account, chats and feeds URLs through the test client as a seeded " \
+           "account and reports latency percentiles, queries and peak memory per route. Every request is " \
+           "rolled back, so the dataset is left as it was. Meant for a development database (see seed_dataset)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per route.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per route before timing.")
+        parser.add_argument('--username', help="Account to benchmark as. Defaults to the most followed one.")
+        parser.add_argument('--output', help="Writes the results as JSON to this file, '-' for stdout.")
+        parser.add_argument('routes', nargs='*', help="Only benchmark these routes, e.g. blog:list.")
+
+    def handle(self, *args, **options):
+        viewer = self.get_viewer(options['username'])
+        scenarios = self.scenarios(viewer)
+
+        missing = sorted(set(self.routes()) - set(scenarios))
+        if missing:
+            raise CommandError("No benchmark scenario for: {routes}".format(routes=", ".join(missing)))
+
+        routes = options['routes'] or sorted(scenarios)
+        unknown = set(routes) - set(scenarios)
+        if unknown:
+            raise CommandError("Unknown routes: {routes}".format(routes=", ".join(sorted(unknown))))
+
+        # A failing route is reported with its status instead of ending the run.
+        client = Client(
+            raise_request_exception=False,
+            SERVER_NAME='127.0.0.1',
+            HTTP_AUTHORIZATION='Token ' + ExpiringToken.objects.issue(viewer).key,
+        )
+
+        results = {}
+        # Uploads go to a throwaway media directory when files are stored locally.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            for route in routes:
+                results[route] = self.benchmark(client, scenarios[route], options['requests'], options['warmup'])
+                self.stdout.write(
+                    "{route:<36} {status} p50 {p50_ms:8.2f} ms  p95 {p95_ms:8.2f} ms  p99 {p99_ms:8.2f} ms  "
+                    "{queries:3d} queries  {peak_memory_kb:8.1f} KB".format(route=route, **results[route])
+                )
+
+        if options['output']:
+            report = json.dumps({
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'viewer': viewer.username,
+                'dataset': {
+                    'accounts': Account.objects.count(),
+                    'posts': BlogPost.objects.count(),
+                },
+                'requests': options['requests'],
+                'routes': results,
+            }, indent=2, sort_keys=True)
+            if options['output'] == '-':
+                self.stdout.write(report)
+            else:
+                with open(options['output'], 'w') as f:
+                    f.write(report + "\n")
+
+    @staticmethod
+    def get_viewer(username):
+        accounts = Account.objects.select_related('auth_token')
+        viewer = accounts.filter(username=username).first() if username else \
+            accounts.filter(username__startswith='seed_').order_by('-follower_count').first()
+        if viewer is None:
+            raise CommandError("No account to benchmark as, run seed_dataset first.")
+        return viewer
+
+    @staticmethod
+    def routes():
+        """
+        The names of the routes of URL_APPS, as app:name.
+        """
+        for app in URL_APPS:
+            for pattern in import_module('{app}.urls'.format(app=app)).urlpatterns:
+                if isinstance(pattern, URLPattern):
+                    yield '{app}:{name}'.format(app=app, name=pattern.name)
+
+    @staticmethod
+    def scenarios(viewer):
+        """
+        One request per route, as (method, path, keyword arguments of the
+        test client).
+        """
+        other = Account.objects.exclude(pk=viewer.pk).order_by('-follower_count').first()
+        own_posts = list(BlogPost.objects.filter(author=viewer, is_draft=False).values_list('id', flat=True)[:3])
+        posts = list(BlogPost.objects.filter(is_draft=False).order_by('-like_count').values_list('id', flat=True)[:10])
+        member = ConversationMember.objects.filter(user=viewer).order_by('-last_message_at').first()
+        if other is None or not own_posts or not posts or member is None:
+            raise CommandError("The account needs posts and conversations, run seed_dataset first.")
+
+        post, own_post = posts[0], own_posts[0]
+        json_body = {'content_type': 'application/json'}
+
+        return {
+            'blog:list': ('get', '/', {}),
+            'blog:post_list': ('get', '/list/{uid}/'.format(uid=other.pk), {}),
+            'blog:create': ('post', '/create/', {'data': lambda: {'title': "benchmark", 'image': png('post.png')}}),
+            'blog:batch_detail': ('get', '/batch/', {'data': {'ids': ",".join(map(str, posts))}}),
+            'blog:batch_create': ('post', '/batch/create/', {'data': lambda: {
+                'title': ["benchmark 1", "benchmark 2"], 'image': [png('post1.png'), png('post2.png')],
+            }}),
+            'blog:batch_delete': ('delete', '/batch/delete/?ids={ids}'.format(ids=",".join(map(str, own_posts))), {}),
+            'blog:detail': ('get', '/{post}/'.format(post=post), {}),
+            'blog:update': ('put', '/{post}/update/'.format(post=own_post), dict(
+                data=json.dumps({'title': "benchmark"}), **json_body,
+            )),
+            'blog:delete': ('delete', '/{post}/delete/'.format(post=own_post), {}),
+            'blog:like': ('get', '/{post}/like/'.format(post=post), {}),
+            'blog:is_author': ('get', '/{post}/is_author/'.format(post=own_post), {}),
+            'account:register': ('post', '/account/register/', dict(data=json.dumps({
+                'first_name': "Bench", 'last_name': "Mark", 'email': "benchmark@example.com",
+                'username': "benchmark_user", 'password': PASSWORD, 'password2': PASSWORD,
+            }), **json_body)),
+            'account:login': ('post', '/account/login/', dict(
+                data=json.dumps({'username': viewer.username, 'password': PASSWORD}), **json_body,
+            )),
+            'account:account_verification': ('get', '/account/verify_account/{uid}/{token}/'.format(
+                uid=urlsafe_base64_encode(force_bytes(viewer.pk)), token=user_tokenizer.make_token(viewer),
+            ), {}),
+            'account:check_if_account_exists': ('get', '/account/check_if_account_exists/{uid}/'.format(
+                uid=other.pk,
+            ), {}),
+            'account:availability': ('get', '/account/availability/', {'data': {
+                'username': [other.username, "benchmark_free"], 'email': "benchmark_free@example.com",
+            }}),
+            'account:change_password': ('put', '/account/change_password/', dict(data=json.dumps({
+                'old_password': PASSWORD, 'new_password': PASSWORD, 'confirm_new_password': PASSWORD,
+            }), **json_body)),
+            'account:properties': ('get', '/account/properties/', {}),
+            'account:update': ('put', '/account/update/', dict(data=json.dumps({'about': "benchmark"}), **json_body)),
+            'account:details': ('get', '/account/details/{uid}/'.format(uid=other.pk), {}),
+            'account:follow': ('get', '/account/follow/{uid}/'.format(uid=other.pk), {}),
+            'account:is_following': ('get', '/account/is_following/{uid}/'.format(uid=other.pk), {}),
+            'account:followers': ('get', '/account/followers/{uid}/'.format(uid=viewer.pk), {}),
+            'account:following': ('get', '/account/following/{uid}/'.format(uid=viewer.pk), {}),
+            'account:upload_profile_picture': ('post', '/account/upload_profile_picture/', {
+                'data': lambda: {'image': png('avatar.png'), 'timestamp': "benchmark"},
+            }),
+            'chats:chat_detail': ('get', '/chats/detail/{uid}/'.format(uid=viewer.pk), {}),
+            'chats:chat_history': ('get', '/chats/history/', {}),
+            'chats:chat_sync': ('get', '/chats/sync/', {}),
+            'chats:chat_search': ('get', '/chats/search/', {'data': {'q': "hello"}}),
+            'chats:inbox': ('get', '/chats/inbox/', {}),
+            'chats:conversation_read': ('post', '/chats/conversations/{conversation}/read/'.format(
+                conversation=member.conversation_id,
+            ), {}),
+            'feeds:home_feed': ('get', '/feeds/', {}),
+        }
+
+    def benchmark(self, client, scenario, requests, warmup):
+        method, path, kwargs = scenario
+
+        def request():
+            # Uploads are consumed by the request, so they are built anew.
+            request_kwargs = {key: value() if callable(value) else value for key, value in kwargs.items()}
+            # Rolled back so that every request finds the same data.
+            try:
+                with transaction.atomic():
+                    response = getattr(client, method)(path, **request_kwargs)
+                    raise Rollback
+            except Rollback:
+                pass
+            return response
+
+        for _ in range(warmup):
+            request()
+
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = request()
+            latencies.append(time.perf_counter() - started)
+        # Counted by MetricsMiddleware, which also sees the queries that async
+        # views run on the connections of other threads.
+        queries = response.wsgi_request.timings.db_queries
+
+        # Measured apart from the timings, which tracing would slow down.
+        tracemalloc.start()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies.sort()
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'queries': queries,
+            'response_bytes': len(response.content),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from account.models import Account
+from blog.models import BlogPost, search_index
+from blog.utils import get_blog_post_slug
+
+WORDS = [
+    "python", "django", "travel", "music", "coffee", "design", "mobile", "flutter", "startup", "cricket",
+    "photography", "recipe", "sunset", "mountain", "weekend", "coding", "release", "database", "index", "search",
+]
+
+
+class Command(BaseCommand):
+    help = "Compares the full-text index against the ILIKE search filter on the blog list queryset."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Number of synthetic posts to create first.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Batch size used when seeding.")
+        parser.add_argument('--repeat', type=int, default=20, help="Number of runs per query and backend.")
+        parser.add_argument('queries', nargs='*', default=["python", "cof", "travel music", "user"])
+
+    def handle(self, *args, **options):
+        if not search_index.is_supported():
+            raise CommandError("Full-text search is not supported on this database.")
+
+        if options['seed']:
+            self.seed(options['seed'], options['batch_size'])
+
+        queryset = BlogPost.objects.filter(is_draft=False).order_by('-date_published', '-id')
+        self.stdout.write("Posts: {count}".format(count=queryset.count()))
+
+        for query in options['queries']:
+            filtered = self.time(lambda: self.ilike(queryset, query), options['repeat'])
+            indexed = self.time(lambda: search_index.search(queryset, query), options['repeat'])
+            self.stdout.write("{query!r}: ilike {filtered:.2f} ms, full-text {indexed:.2f} ms".format(
+                query=query, filtered=filtered, indexed=indexed,
+            ))
+
+    @staticmethod
+    def ilike(queryset, query):
+        # Mirrors SearchFilter with search_fields = ('title', 'author__username').
+        for term in query.split():
+            queryset = queryset.filter(Q(title__icontains=term) | Q(author__username__icontains=term))
+        return queryset
+
+    @staticmethod
+    def time(search, repeat):
+        """
+        Average milliseconds to fetch the count and the first page of results.
+        """
+        start = time.perf_counter()
+        for _ in range(repeat):
+            queryset = search()
+            queryset.count()
+            list(queryset[:10])
+        return (time.perf_counter() - start) * 1000 / repeat
+
+    def seed(self, count, batch_size):
+        author = Account.objects.filter(username='search_benchmark').first()
+        if author is None:
+            author = Account.objects.create_user(
+                "Search", "Benchmark", "search_benchmark@example.com", "search_benchmark", None
+            )
+
+        created = 0
+        while created < count:
+            posts = []
+            for _ in range(min(batch_size, count - created)):
+                title = " ".join(random.sample(WORDS, 4))
+                posts.append(BlogPost(
+                    author=author,
+                    title=title,
+                    slug=get_blog_post_slug(title),
+                ))
+            BlogPost.objects.bulk_create(posts, batch_size=batch_size)
+            search_index.update(posts)
+            created += len(posts)
+            self.stdout.write("Seeded {created}/{count} posts".format(created=created, count=count))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from account.models import ProfilePicture, invalidate_cached_picture
+from blog.models import BlogPost, invalidate_cached_post
+from blogapi import renditions
+
+
+class Command(BaseCommand):
+    help = "Generates the missing image renditions of blog posts and profile pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Regenerate the renditions of every image, not only the missing ones.",
+        )
+
+    def handle(self, *args, **options):
+        for model, on_generated in ((BlogPost, invalidate_cached_post), (ProfilePicture, invalidate_cached_picture)):
+            queryset = model.objects.exclude(image__isnull=True).exclude(image='')
+            if not options['all']:
+                queryset = queryset.filter(image_renditions={})
+
+            count = 0
+            for pk, stale_renditions in queryset.values_list('pk', 'image_renditions').iterator():
+                try:
+                    instance = renditions.generate(model, pk)
+                except OSError as e:
+                    self.stderr.write("{model} {pk}: {error}".format(model=model.__name__, pk=pk, error=e))
+                    continue
+
+                if instance is None:
+                    continue
+
+                # Regenerated renditions keep their names only if the storage
+                # overwrites files, drop whatever was replaced.
+                stale_names = set(stale_renditions.values()) - set(instance.image_renditions.values())
+                for name in stale_names:
+                    instance.image.storage.delete(name)
+
+                if on_generated is not None:
+                    on_generated(instance)
+                count += 1
+
+            self.stdout.write(self.style.SUCCESS(
+                "Generated renditions of {count} {name}.".format(
+                    count=count, name=model._meta.verbose_name_plural,
+                )
+            ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import BlogPost, search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of blog posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of posts indexed per statement.",
+        )
+
+    def handle(self, *args, **options):
+        if not search_index.is_supported():
+            raise CommandError("Full-text search is not supported on this database.")
+
+        count = search_index.rebuild(BlogPost.objects.select_related('author'), batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS("Indexed {count} posts.".format(count=count)))
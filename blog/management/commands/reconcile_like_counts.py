@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = "Recomputes the denormalized like counter of every blog post from the likes table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of posts updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        post_ids = BlogPost.objects.order_by('pk').values_list('pk', flat=True)
+
+        batch = []
+        updated = 0
+        for post_id in post_ids.iterator(chunk_size=batch_size):
+            batch.append(post_id)
+            if len(batch) >= batch_size:
+                updated += BlogPost.objects.filter(pk__in=batch).reconcile_like_counts()
+                batch = []
+        if batch:
+            updated += BlogPost.objects.filter(pk__in=batch).reconcile_like_counts()
+
+        self.stdout.write(self.style.SUCCESS("Reconciled like counts of {count} posts.".format(count=updated)))
@@ -0,0 +1,250 @@
+import io
+import itertools
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from account.availability import availability_index
+from account.models import Account, ExpiringToken, Follow, ProfilePicture
+from blog.models import BlogPost
+from chats.models import Chats, Conversation, ConversationMember, PREVIEW_LENGTH, search_index as chat_search_index
+
+PASSWORD = 'seed-password'
+
+WORDS = [
+    "python", "django", "travel", "music", "coffee", "design", "mobile", "flutter", "startup", "cricket",
+    "photography", "recipe", "sunset", "mountain", "weekend", "coding", "release", "database", "index", "search",
+    "hello", "thanks", "tomorrow", "meeting", "lunch", "photo", "game", "movie", "book", "city",
+]
+
+
+class PowerLaw:
+    """
+    Picks items with a Zipf-like skew: the item at rank r is drawn with a
+    weight of 1 / (r + 1) ** exponent, so a few items get most of the picks.
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(len(items))))
+
+    def pick(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+
+class Command(BaseCommand):
+    help = "Seeds a synthetic dataset of accounts, follows, posts, likes, profile pictures and chats with " \
+           "power-law distributions, for benchmarks. Accounts are named seed_<n> with the password " \
+           "'{password}'.".format(password=PASSWORD)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=1000, help="Number of accounts to create.")
+        parser.add_argument('--follows', type=int, default=20000, help="Number of follow edges to create.")
+        parser.add_argument('--posts', type=int, default=10000, help="Number of posts to create.")
+        parser.add_argument('--likes', type=int, default=50000, help="Number of likes to create.")
+        parser.add_argument('--pictures', type=float, default=0.5, help="Share of accounts with a profile picture.")
+        parser.add_argument('--messages', type=int, default=20000, help="Number of chat messages to create.")
+        parser.add_argument('--exponent', type=float, default=1.1, help="Skew of the power-law distributions.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows inserted per statement.")
+        parser.add_argument('--random-seed', type=int, default=0, help="Seed of the random generator.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['random_seed'])
+        self.batch_size = options['batch_size']
+        exponent = options['exponent']
+
+        started = time.perf_counter()
+        accounts = self.timed("accounts", lambda: self.seed_accounts(options['accounts']))
+        if len(accounts) < 2:
+            self.stdout.write("Nothing else to seed with fewer than two accounts.")
+            return
+
+        # Accounts keep the same rank in every distribution, so the most
+        # followed accounts are also the ones posting and chatting the most.
+        popular = PowerLaw(accounts, exponent, self.rng)
+
+        self.timed("profile pictures", lambda: self.seed_pictures(accounts, options['pictures']))
+        self.timed("follows", lambda: self.seed_follows(accounts, popular, options['follows']))
+        posts = self.timed("posts", lambda: self.seed_posts(popular, options['posts']))
+        if posts:
+            self.timed("likes", lambda: self.seed_likes(accounts, PowerLaw(posts, exponent, self.rng), options['likes']))
+        self.timed("chat messages", lambda: self.seed_messages(accounts, popular, options['messages']))
+
+        self.stdout.write(self.style.SUCCESS("Seeded the dataset in {seconds:.1f} s.".format(
+            seconds=time.perf_counter() - started,
+        )))
+
+    def timed(self, what, seed):
+        started = time.perf_counter()
+        result = seed()
+        self.stdout.write("Seeded {what} in {seconds:.1f} s".format(what=what, seconds=time.perf_counter() - started))
+        return result
+
+    def batches(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def seed_accounts(self, count):
+        """
+        Creates `count` accounts and their tokens. The password is hashed
+        once and shared, which is what makes seeding accounts fast.
+        """
+        first = Account.objects.filter(username__startswith='seed_').count()
+        password = make_password(PASSWORD)
+        expires_at = timezone.now() + ExpiringToken.lifetime()
+
+        accounts = []
+        for batch in self.batches(range(first, first + count)):
+            created = Account.objects.bulk_create([
+                Account(
+                    username='seed_{n}'.format(n=n),
+                    email='seed_{n}@example.com'.format(n=n),
+                    first_name='Seed',
+                    last_name=str(n),
+                    password=password,
+                    is_valid=True,
+                ) for n in batch
+            ])
+            # bulk_create sends no post_save, so the tokens and the recently
+            # taken names are added here.
+            ExpiringToken.objects.bulk_create([
+                ExpiringToken(user=account, key=ExpiringToken.generate_key(), expires_at=expires_at)
+                for account in created
+            ])
+            for account in created:
+                availability_index.remember(account)
+            accounts += created
+        return accounts
+
+    def seed_pictures(self, accounts, share):
+        """
+        Gives a share of the accounts a profile picture. They all point to
+        one stored image, so that no time goes into storage.
+        """
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 120, 60)).save(buffer, format='PNG')
+        name = default_storage.save('profile_pictures/seed/avatar.png', ContentFile(buffer.getvalue()))
+
+        with_picture = self.rng.sample(accounts, int(len(accounts) * share))
+        for batch in self.batches(with_picture):
+            pictures = ProfilePicture.objects.bulk_create([
+                ProfilePicture(user=account, image=name, image_width=64, image_height=64) for account in batch
+            ])
+            for account, picture in zip(batch, pictures):
+                account.profile_picture = picture
+            Account.objects.bulk_update(batch, ['profile_picture'])
+
+    def seed_follows(self, accounts, popular, count):
+        edges = set()
+        # Bounded, since the power law keeps drawing the same few followees.
+        for _ in range(count * 3):
+            if len(edges) >= count:
+                break
+            follower, followee = self.rng.choice(accounts), popular.pick()[0]
+            if follower != followee:
+                edges.add((follower.pk, followee.pk))
+
+        for batch in self.batches(edges):
+            Follow.objects.bulk_create([
+                Follow(follower_id=follower, followee_id=followee) for follower, followee in batch
+            ], ignore_conflicts=True)
+        call_command('reconcile_follow_counts', batch_size=self.batch_size, stdout=io.StringIO())
+
+    def seed_posts(self, popular, count):
+        """
+        Creates the posts through `bulk_create_posts`, which also indexes them
+        and fans them out to the home timelines of the followers.
+        """
+        posts = []
+        for batch in self.batches(popular.pick(count)):
+            posts += BlogPost.objects.bulk_create_posts([
+                BlogPost(author=author, title=" ".join(self.rng.sample(WORDS, 5))) for author in batch
+            ])
+        return posts
+
+    def seed_likes(self, accounts, posts, count):
+        likes = {(post.pk, self.rng.choice(accounts).pk) for post in posts.pick(count)}
+
+        Like = BlogPost.likes.through
+        for batch in self.batches(likes):
+            Like.objects.bulk_create([
+                Like(blogpost_id=post_id, account_id=account_id) for post_id, account_id in batch
+            ], ignore_conflicts=True)
+        call_command('reconcile_like_counts', batch_size=self.batch_size, stdout=io.StringIO())
+
+    def seed_messages(self, accounts, popular, count):
+        """
+        Creates chat messages between a skewed set of pairs of accounts, with
+        their conversations and inbox entries as the chat API leaves them.
+        """
+        conversations = {}
+        last_messages = {}
+        unread = Counter()
+
+        for batch in self.batches(range(count)):
+            pairs = [(self.rng.choice(accounts), popular.pick()[0]) for _ in batch]
+            pairs = [(sender, recipient) for sender, recipient in pairs if sender != recipient]
+
+            # The seeded accounts are new, so none of their conversations
+            # exist yet.
+            new_conversations = {}
+            for sender, recipient in pairs:
+                key = Conversation.objects.direct_key(sender.pk, recipient.pk)
+                if key not in conversations and key not in new_conversations:
+                    new_conversations[key] = (Conversation(key=key), sender, recipient)
+
+            chats = []
+            for sender, recipient in pairs:
+                key = Conversation.objects.direct_key(sender.pk, recipient.pk)
+                conversation = conversations.get(key) or new_conversations[key][0]
+                chat = Chats(
+                    user=recipient,
+                    sender=str(sender.pk),
+                    conversation=conversation,
+                    message=" ".join(self.rng.choices(WORDS, k=self.rng.randint(2, 12))),
+                )
+                chats.append(chat)
+                last_messages[key] = (chat, sender.pk)
+                unread[(conversation.pk, recipient.pk)] += 1
+
+            with transaction.atomic():
+                Conversation.objects.bulk_create([conversation for conversation, _, _ in new_conversations.values()])
+                ConversationMember.objects.bulk_create(itertools.chain.from_iterable((
+                    ConversationMember(conversation=conversation, user=sender, peer=recipient),
+                    ConversationMember(conversation=conversation, user=recipient, peer=sender),
+                ) for conversation, sender, recipient in new_conversations.values()))
+                Chats.objects.bulk_create(chats)
+                chat_search_index.update(chats)
+            conversations.update((key, value[0]) for key, value in new_conversations.items())
+
+        for batch in self.batches(last_messages.items()):
+            updated = {}
+            for key, (chat, sender_id) in batch:
+                conversation = conversations[key]
+                conversation.last_message_at = chat.sent_at
+                conversation.last_message_preview = chat.message[:PREVIEW_LENGTH]
+                conversation.last_sender_id = sender_id
+                updated[conversation.pk] = conversation
+            Conversation.objects.bulk_update(
+                updated.values(), ['last_message_at', 'last_message_preview', 'last_sender'],
+            )
+
+            members = list(ConversationMember.objects.filter(conversation__in=list(updated)))
+            for member in members:
+                member.last_message_at = updated[member.conversation_id].last_message_at
+                member.unread_count = unread[(member.conversation_id, member.user_id)]
+            ConversationMember.objects.bulk_update(members, ['last_message_at', 'unread_count'])
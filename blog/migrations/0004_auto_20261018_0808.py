@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_rename_date_updated_blogpost_last_updated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['is_draft', 'date_published', 'id'], name='blog_post_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['author', 'is_draft', 'date_published'], name='blog_post_author_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_like_count(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    like_counts = BlogPost.likes.through.objects.filter(
+        blogpost=OuterRef('pk')
+    ).order_by().values('blogpost').annotate(count=Count('*')).values('count')
+
+    BlogPost.objects.update(like_count=Coalesce(Subquery(like_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_auto_20261018_0808'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Like Count'),
+        ),
+        migrations.RunPython(populate_like_count, migrations.RunPython.noop),
+    ]
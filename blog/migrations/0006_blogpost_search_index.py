@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from blogapi.fulltext import FullTextIndex
+
+
+def search_document(blog_post):
+    # As blog.models.search_document was when this migration was written.
+    return "{title} {username}".format(title=blog_post.title, username=blog_post.author.username)
+
+
+def create_search_index(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    search_index = FullTextIndex(BlogPost, 'blog_blogpost_search', search_document)
+
+    search_index.create_schema(schema_editor)
+    if search_index.is_supported(schema_editor.connection):
+        search_index.rebuild(BlogPost.objects.select_related('author'), using=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    FullTextIndex(BlogPost, 'blog_blogpost_search', search_document).drop_schema(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_blogpost_like_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blogpost_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Image Height'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image Renditions'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Image Width'),
+        ),
+    ]
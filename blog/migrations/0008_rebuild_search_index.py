@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from blogapi.fulltext import FullTextIndex
+
+
+def search_document(blog_post):
+    # As blog.models.search_document was when this migration was written.
+    return "{title} {username}".format(title=blog_post.title, username=blog_post.author.username)
+
+
+def rebuild_search_index(apps, schema_editor):
+    # SQLite documents are now keyed by a rowid derived from the post.
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    search_index = FullTextIndex(BlogPost, 'blog_blogpost_search', search_document)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        search_index.rebuild(BlogPost.objects.select_related('author'), using=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,21 @@ import os
 import uuid
 
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import pre_save, post_delete
-from django.dispatch import receiver
-from django.utils.text import slugify
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver, Signal
 from django.utils.translation import ugettext_lazy as _
 
-from blog.utils import get_random_alphanumeric_string
+from blogapi import renditions
+from blogapi.cache import VersionedCache
+from blogapi.fulltext import FullTextIndex
+from blog.utils import get_blog_post_slug
+
+# Sent with `instances` after BlogPost.objects.bulk_create_posts(), which
+# bypasses the per-instance save signals.
+blog_posts_bulk_created = Signal()
 
 
 def upload_location(instance, filename):
@@ -21,6 +29,48 @@ def upload_location(instance, filename):
     return filepath
 
 
+class BlogPostQuerySet(models.QuerySet):
+    def for_viewer(self, user):
+        """
+        Annotates whether `user` liked each post. The authors come from their
+        cached user cards, so BlogPostSerializer needs no per-post queries.
+        """
+        viewer_likes = BlogPost.likes.through.objects.filter(blogpost=OuterRef('pk'), account=user.pk)
+
+        return self.annotate(
+            is_liked=Exists(viewer_likes),
+        )
+
+    def bulk_create_posts(self, blog_posts):
+        """
+        Inserts `blog_posts` with one statement per batch. Slugs are generated
+        here instead of in the pre_save signal and `blog_posts_bulk_created`
+        is sent in place of the post_save signals.
+        """
+        for blog_post in blog_posts:
+            if not blog_post.slug:
+                blog_post.slug = get_blog_post_slug(blog_post.title)
+            renditions.prepare(blog_post)
+
+        with transaction.atomic():
+            self.bulk_create(blog_posts)
+            for blog_post in blog_posts:
+                renditions.schedule(blog_post, on_generated=invalidate_cached_post)
+            blog_posts_bulk_created.send(sender=BlogPost, instances=blog_posts)
+        return blog_posts
+
+    def reconcile_like_counts(self):
+        """
+        Recomputes the denormalized like_count of every post in the queryset
+        from the likes table in a single UPDATE.
+        """
+        like_counts = BlogPost.likes.through.objects.filter(
+            blogpost=OuterRef('pk')
+        ).order_by().values('blogpost').annotate(count=Count('*')).values('count')
+
+        return self.update(like_count=Coalesce(Subquery(like_counts), 0))
+
+
 class BlogPost(models.Model):
     id = models.UUIDField(
         default=uuid.uuid4,
@@ -35,6 +85,24 @@ class BlogPost(models.Model):
         blank=True,
         verbose_name=_("Image")
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Image Width")
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Image Height")
+    )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name=_("Image Renditions")
+    )
     title = models.CharField(
         max_length=500,
         null=False,
@@ -58,6 +126,11 @@ class BlogPost(models.Model):
         blank=True,
         verbose_name=_("Likes")
     )
+    like_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Like Count")
+    )
     is_draft = models.BooleanField(
         default=False,
         verbose_name=_("Draft Status")
@@ -71,24 +144,140 @@ class BlogPost(models.Model):
         verbose_name=_("Date Updated")
     )
 
+    objects = BlogPostQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Blog Post")
         verbose_name_plural = _("Blog Posts")
+        indexes = [
+            models.Index(fields=['is_draft', 'date_published', 'id'], name='blog_post_timeline_idx'),
+            models.Index(fields=['author', 'is_draft', 'date_published'], name='blog_post_author_timeline_idx'),
+        ]
 
     def __str__(self):
         return self.slug
 
+    def toggle_like(self, user):
+        """
+        Likes the post for `user`, or removes the like if it exists. Only the
+        (post, user) row of the likes table is touched, so the cost does not
+        grow with the number of likes; like_count follows in `likes_changed`.
+        """
+        with transaction.atomic():
+            if BlogPost.likes.through.objects.filter(blogpost=self, account=user).exists():
+                self.likes.remove(user)
+                return False
+
+            self.likes.add(user)
+            return True
+
+
+def search_document(blog_post):
+    return "{title} {username}".format(title=blog_post.title, username=blog_post.author.username)
+
+
+search_index = FullTextIndex(BlogPost, 'blog_blogpost_search', search_document)
+
+post_cache = VersionedCache('blog:post', settings.POST_CACHE_TIMEOUT)
+
+
+def invalidate_cached_post(blog_post):
+    post_cache.invalidate(blog_post.pk)
+
+
+@receiver(pre_save, sender=BlogPost)
+def blog_post_image_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        renditions.prepare(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_image_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        renditions.schedule(instance, on_generated=invalidate_cached_post)
+
 
 @receiver(post_delete, sender=BlogPost)
 def submission_delete(sender, instance, **kwargs):
-    instance.image.delete(False)
+    # Deferred so that storage is only touched once the deletion is committed.
+    def delete_image():
+        renditions.delete_renditions(instance.image, instance.image_renditions)
+        instance.image.delete(False)
+
+    transaction.on_commit(delete_image)
+
+
+@receiver(post_save, sender=BlogPost)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_index.update([instance])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_author_posts(sender, instance, created=False, raw=False, **kwargs):
+    # Documents include the username of the author.
+    if created or raw or not instance.has_changed('username'):
+        return
+
+    posts = list(BlogPost.objects.filter(author=instance).only('title'))
+    for post in posts:
+        post.author = instance
+    search_index.update(posts)
+
+
+@receiver(blog_posts_bulk_created, sender=BlogPost)
+def update_search_index_in_bulk(sender, instances, **kwargs):
+    search_index.update(instances)
+
+
+@receiver(post_delete, sender=BlogPost)
+def remove_from_search_index(sender, instance, **kwargs):
+    search_index.remove([instance.pk])
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_post_cache(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: post_cache.invalidate(pk))
+
+
+@receiver(m2m_changed, sender=BlogPost.likes.through)
+def likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps like_count in step with every change to the likes, from either
+    side of the relation.
+    """
+    if action == 'pre_clear' and reverse:
+        # clear() does not say which posts it touches.
+        instance._cleared_like_post_ids = list(
+            BlogPost.likes.through.objects.filter(account=instance).values_list('blogpost_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_clear':
+        post_ids = instance.__dict__.pop('_cleared_like_post_ids', []) if reverse else [instance.pk]
+        BlogPost.objects.filter(pk__in=post_ids).reconcile_like_counts()
+    else:
+        # Either one post gained or lost the likes of pk_set, or every post in
+        # pk_set one like.
+        post_ids = pk_set if reverse else [instance.pk]
+        delta = 1 if reverse else len(pk_set)
+        if action == 'post_add':
+            like_count = F('like_count') + delta
+        else:
+            like_count = Greatest(F('like_count') - delta, 0)
+        BlogPost.objects.filter(pk__in=post_ids).update(like_count=like_count)
+
+    for pk in post_ids:
+        transaction.on_commit(lambda pk=pk: post_cache.invalidate(pk))
 
 
 def pre_save_blog_post_receiver(sender, instance, *args, **kwargs):
     if not instance.slug:
-        rand_str1 = get_random_alphanumeric_string(8)
-        rand_str2 = get_random_alphanumeric_string(8)
-        instance.slug = slugify(rand_str1 + "-" + instance.title + "-" + rand_str2)
+        instance.slug = get_blog_post_slug(instance.title)
 
 
 pre_save.connect(pre_save_blog_post_receiver, sender=BlogPost)
@@ -0,0 +1,42 @@
+from rest_framework.pagination import CursorPagination
+
+from blogapi.async_api import AsyncPageNumberPagination
+
+
+class BlogPostCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (date_published, id). Cursors are opaque, no
+    COUNT(*) is issued and pages stay stable while new posts are published.
+    """
+    ordering = ('-date_published', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # Only (date_published, id) is indexed and unique enough to page on,
+        # so the `ordering` and relevance order of the list views do not apply.
+        return self.ordering
+
+
+class BlogPostPagination(AsyncPageNumberPagination):
+    """
+    Page number pagination by default. Clients switch to cursor pagination
+    by sending `?pagination=cursor` or a `cursor` obtained from a previous page.
+    """
+    mode_query_param = 'pagination'
+    cursor_paginator_class = BlogPostCursorPagination
+
+    cursor_paginator = None
+
+    def use_cursor(self, query_params):
+        cursor_query_param = self.cursor_paginator_class.cursor_query_param
+        return cursor_query_param in query_params or query_params.get(self.mode_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request.query_params):
+            self.cursor_paginator = self.cursor_paginator_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,55 +1,83 @@
+from django.db.models import Manager
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from rest_framework.serializers import ListSerializer, ModelSerializer, SerializerMethodField
 
-from account.models import ProfilePicture
-from account.serializers import ProfilePictureSerializer
+from account.cards import user_cards
 from blog.models import BlogPost
+from blogapi import renditions
 
 IMAGE_SIZE_MAX_BYTES = 1024 * 1024 * 2
 DOES_NOT_EXIST = "DOES_NOT_EXIST"
 
 
-class BlogPostSerializer(ModelSerializer):
+class BlogPostListSerializer(ListSerializer):
+    """
+    Fetches the author cards of a whole page of posts at once.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, Manager) else data)
+        self.context['author_cards'] = user_cards.get_many(post.author_id for post in posts)
+        return super().to_representation(posts)
+
+
+class BlogPostPublicSerializer(ModelSerializer):
+    """
+    The part of a post that is the same for every viewer. The author fields
+    come from the author's cached user card.
+    """
     author_name = SerializerMethodField()
     author_username = SerializerMethodField()
     author_id = SerializerMethodField()
-    like_count = SerializerMethodField()
-    is_liked = SerializerMethodField()
     profile_pic_url = SerializerMethodField()
+    image_renditions = SerializerMethodField()
 
     class Meta:
         model = BlogPost
         fields = [
-            "id", "title", "image", "slug", "likes", "like_count", "date_published", "last_updated",
-            "is_liked", "author_name", "author_username", "author_id", "profile_pic_url"
+            "id", "title", "image", "image_width", "image_height", "image_renditions", "slug", "like_count",
+            "date_published", "last_updated", "author_name", "author_username", "author_id", "profile_pic_url"
         ]
+        list_serializer_class = BlogPostListSerializer
+
+    def get_author_card(self, obj):
+        cards = self.context.get('author_cards')
+        if cards is None or obj.author_id not in cards:
+            cards = user_cards.get_many([obj.author_id])
+        return cards[obj.author_id]
+
+    def get_image_renditions(self, obj):
+        return renditions.rendition_urls(obj.image, obj.image_renditions, self.context.get('request'))
 
     def get_author_name(self, obj):
-        return obj.author.first_name + " " + obj.author.last_name
+        return self.get_author_card(obj).full_name
 
     def get_author_username(self, obj):
-        return obj.author.username
+        return self.get_author_card(obj).username
 
     def get_author_id(self, obj):
-        return obj.author.id
+        return obj.author_id
 
     def get_profile_pic_url(self, obj):
-        try:
-            image = ProfilePicture.objects.filter(user=obj.author.id).order_by('-uploaded_at')[0]
-        except (ProfilePicture.DoesNotExist, IndexError):
-            image = ""
+        return self.get_author_card(obj).profile_picture(self.context.get('request'))
 
-        serializer = ProfilePictureSerializer(image)
 
-        return serializer.data
+class BlogPostSerializer(BlogPostPublicSerializer):
+    is_liked = SerializerMethodField()
 
-    def get_like_count(self, obj):
-        return obj.likes.count()
+    class Meta:
+        model = BlogPost
+        fields = [
+            "id", "title", "image", "image_width", "image_height", "image_renditions", "slug", "like_count",
+            "date_published", "last_updated", "is_liked", "author_name", "author_username", "author_id",
+            "profile_pic_url"
+        ]
+        list_serializer_class = BlogPostListSerializer
 
     def get_is_liked(self, obj):
-        if self.context['request'].user in obj.likes.all():
-            return True
-        return False
+        if hasattr(obj, 'is_liked'):
+            return obj.is_liked
+        return obj.likes.filter(pk=self.context['request'].user.pk).exists()
 
 
 class BlogPostUpdateSerializer(ModelSerializer):
@@ -116,3 +144,16 @@ class BlogPostCreateSerializer(ModelSerializer):
 
         blog_post.save()
         return blog_post
+
+
+class BlogPostBatchCreateSerializer(ModelSerializer):
+    class Meta:
+        model = BlogPost
+        fields = ["title", "image"]
+
+    def validate(self, data):
+        if not data.get('image'):
+            raise ValidationError({'image': 'This field is required.'})
+        if not data.get('title'):
+            raise ValidationError({'title': 'This field is required.'})
+        return data
@@ -0,0 +1,140 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from account.models import Account, ExpiringToken
+from blog.models import BlogPost, search_index
+
+
+# Whatever cache the environment configures, lookups must not touch the database.
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class BlogPostQueryCountTests(TransactionTestCase):
+    """
+    The list and detail endpoints must cost the same number of queries
+    whatever the number of posts, authors and likes on a page.
+
+    The async views query from other threads, on connections that
+    assertNumQueries does not see, and their data has to be committed for
+    those connections to see it. Queries are therefore counted by
+    MetricsMiddleware, which counts them on every connection.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = self.create_account("viewer")
+        self.client = Client(HTTP_AUTHORIZATION='Token ' + ExpiringToken.objects.get(user=self.viewer).key)
+
+    @staticmethod
+    def create_account(username):
+        return Account.objects.create_user("First", "Last", username + "@example.com", username, "password")
+
+    def create_posts(self, count):
+        first = Account.objects.count()
+        authors = [self.create_account("author{n}".format(n=n)) for n in range(first, first + count)]
+        posts = [BlogPost.objects.create(author=author, title="post {n}".format(n=n)) for n, author in enumerate(authors)]
+        for post in posts[::2]:
+            post.likes.add(self.viewer)
+        return posts
+
+    def assertNumRequestQueries(self, num, path):
+        # A first request fills the token and author card caches.
+        self.client.get(path)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.timings.db_queries, num)
+        return response
+
+    def test_list(self):
+        self.create_posts(2)
+        self.assertNumRequestQueries(2, reverse('list'))
+
+        self.create_posts(8)
+        response = self.assertNumRequestQueries(2, reverse('list'))
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_list_uncached_author_cards(self):
+        self.create_posts(10)
+        self.client.get(reverse('list'))
+        cache.clear()
+        # The token with its user, whose cached copy only the shared cache
+        # holds, the count, the page and one query for the cards of all
+        # authors.
+        response = self.client.get(reverse('list'))
+        self.assertEqual(response.wsgi_request.timings.db_queries, 4)
+
+    def test_user_list(self):
+        author = self.create_account("prolific")
+        for n in range(2):
+            BlogPost.objects.create(author=author, title="post {n}".format(n=n))
+        path = reverse('post_list', kwargs={'uid': author.pk})
+        self.assertNumRequestQueries(2, path)
+
+        for n in range(8):
+            BlogPost.objects.create(author=author, title="more {n}".format(n=n)).likes.add(self.viewer)
+        response = self.assertNumRequestQueries(2, path)
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_detail(self):
+        post = self.create_posts(1)[0]
+        response = self.assertNumRequestQueries(1, reverse('detail', kwargs={'post_id': post.pk}))
+        self.assertTrue(response.json()['is_liked'])
+
+
+class SearchIndexTests(TestCase):
+    def search(self, query):
+        return list(search_index.search(BlogPost.objects.all(), query))
+
+    def test_posts_are_reindexed_when_their_author_is_renamed(self):
+        author = Account.objects.create_user("First", "Last", "writer@example.com", "writer", "password")
+        post = BlogPost.objects.create(author=author, title="Bridges")
+        self.assertEqual(self.search("writer"), [post])
+
+        author.username = "engineer"
+        author.save()
+
+        self.assertEqual(self.search("writer"), [])
+        self.assertEqual(self.search("engineer"), [post])
+
+
+class LikeCountTests(TestCase):
+    def setUp(self):
+        self.author, self.first, self.second = [
+            Account.objects.create_user("First", "Last", name + "@example.com", name, "password")
+            for name in ("author", "first", "second")
+        ]
+        self.post = BlogPost.objects.create(author=self.author, title="Bridges")
+        self.other_post = BlogPost.objects.create(author=self.author, title="Tunnels")
+
+    def assertLikeCounts(self, post_count, other_post_count):
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.other_post.like_count), (post_count, other_post_count))
+
+    def test_toggle_like(self):
+        self.assertTrue(self.post.toggle_like(self.first))
+        self.assertTrue(self.post.toggle_like(self.second))
+        self.assertLikeCounts(2, 0)
+
+        self.assertFalse(self.post.toggle_like(self.first))
+        self.assertLikeCounts(1, 0)
+
+    def test_likes_changed_from_the_post(self):
+        self.post.likes.add(self.first, self.second)
+        self.assertLikeCounts(2, 0)
+
+        self.post.likes.remove(self.first)
+        self.assertLikeCounts(1, 0)
+
+        self.post.likes.clear()
+        self.assertLikeCounts(0, 0)
+
+    def test_likes_changed_from_the_account(self):
+        self.first.blog_post_likes.add(self.post, self.other_post)
+        self.second.blog_post_likes.add(self.post)
+        self.assertLikeCounts(2, 1)
+
+        self.first.blog_post_likes.remove(self.other_post)
+        self.assertLikeCounts(2, 0)
+
+        self.first.blog_post_likes.clear()
+        self.assertLikeCounts(1, 0)
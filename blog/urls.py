@@ -5,16 +5,22 @@ from blog.views import (
     api_create_blog_view,
     api_update_blog_view,
     api_delete_blog_view,
-    ApiBlogListView,
+    api_blog_list_view,
     ApiUserBlogListView,
     api_is_author_of_blogpost,
     api_like_toggle_view,
+    api_batch_detail_blog_view,
+    api_batch_create_blog_view,
+    api_batch_delete_blog_view,
 )
 
 urlpatterns = [
-    path('', ApiBlogListView.as_view(), name="list"),
+    path('', api_blog_list_view, name="list"),
     path('list/<uid>/', ApiUserBlogListView.as_view(), name='post_list'),
     path('create/', api_create_blog_view, name="create"),
+    path('batch/', api_batch_detail_blog_view, name="batch_detail"),
+    path('batch/create/', api_batch_create_blog_view, name="batch_create"),
+    path('batch/delete/', api_batch_delete_blog_view, name="batch_delete"),
     path('<post_id>/', api_detail_blog_view, name="detail"),
     path('<post_id>/update/', api_update_blog_view, name="update"),
     path('<post_id>/delete/', api_delete_blog_view, name="delete"),
@@ -2,12 +2,12 @@ import os
 import random
 import string
 
-from cv2 import imread
+from django.core.files.images import get_image_dimensions
+from django.utils.text import slugify
 
 
 def is_image_aspect_ratio_valid(img_url):
-    img = imread(img_url)
-    dimension = tuple(img.shape[1::-1])
+    dimension = get_image_dimensions(img_url)
     print("dimensions: " + str(dimension))
     aspect_ratio = dimension[0] / dimension[1]
     print("aspect_ratio: " + str(aspect_ratio))
@@ -29,3 +29,9 @@ def get_random_alphanumeric_string(length):
     letters_and_digits = string.ascii_letters + string.digits
     result_str = ''.join((random.choice(letters_and_digits) for i in range(length)))
     return result_str
+
+
+def get_blog_post_slug(title):
+    rand_str1 = get_random_alphanumeric_string(8)
+    rand_str2 = get_random_alphanumeric_string(8)
+    return slugify(rand_str1 + "-" + title + "-" + rand_str2)
@@ -1,17 +1,28 @@
+import asyncio
+import uuid
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListAPIView
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-
-from blog.models import BlogPost
+from rest_framework.settings import api_settings
+
+from account.cards import user_cards
+from account.utils import ExpiringTokenAuthentication
+from blogapi.async_api import async_api_view, database_sync_to_async
+from blogapi.fulltext import FullTextSearchFilter
+from blog.models import BlogPost, post_cache, search_index
+from blog.pagination import BlogPostPagination
 from blog.serializers import (
+    BlogPostPublicSerializer,
     BlogPostSerializer,
     BlogPostUpdateSerializer,
     BlogPostCreateSerializer,
+    BlogPostBatchCreateSerializer,
 )
 
 SUCCESS = "SUCCESS"
@@ -24,56 +35,130 @@ DOES_NOT_EXIST = "DOES_NOT_EXIST"
 
 
 class ApiBlogListView(ListAPIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     serializer_class = BlogPostSerializer
-    pagination_class = PageNumberPagination
-    filter_backends = (SearchFilter, OrderingFilter)
+    pagination_class = BlogPostPagination
+    filter_backends = (FullTextSearchFilter, OrderingFilter)
     search_fields = ('title', 'author__username')
+    search_index = search_index
 
     def get_queryset(self, *args, **kwargs):
-        queryset = BlogPost.objects.filter(is_draft=False).order_by('-date_published')
+        return published_posts(self.request.user)
+
+
+def published_posts(user):
+    return BlogPost.objects.for_viewer(user).filter(
+        is_draft=False
+    ).order_by('-date_published', '-id')
+
+
+blog_list_view = ApiBlogListView.as_view()
+
+
+async def api_blog_list_view(request):
+    """
+    Pages of posts by number are served asynchronously; searches, orderings
+    and cursor pages by ApiBlogListView.
+    """
+    query_params = request.GET
+    if request.method != 'GET' or api_settings.SEARCH_PARAM in query_params or \
+            api_settings.ORDERING_PARAM in query_params or BlogPostPagination().use_cursor(query_params):
+        return await database_sync_to_async(blog_list_view)(request)
+    return await api_blog_page_view(request)
 
-        return queryset
+
+# Unsafe methods are answered by ApiBlogListView, which is exempt too.
+api_blog_list_view.csrf_exempt = True
+
+
+@async_api_view
+async def api_blog_page_view(request):
+    paginator = BlogPostPagination()
+    blog_posts = await paginator.apaginate_queryset(published_posts(request.user), request)
+
+    serializer = BlogPostSerializer(blog_posts, many=True, context={'request': request})
+    # Serializing a page resolves the author cards.
+    data = await database_sync_to_async(lambda: serializer.data)()
+    return paginator.get_paginated_response(data)
 
 
 class ApiUserBlogListView(ListAPIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     serializer_class = BlogPostSerializer
-    pagination_class = PageNumberPagination
-    filter_backends = (SearchFilter, OrderingFilter)
+    pagination_class = BlogPostPagination
+    filter_backends = (FullTextSearchFilter, OrderingFilter)
     search_fields = ('title', 'author__username')
+    search_index = search_index
     lookup_url_kwarg = "uid"
 
     def get_queryset(self, *args, **kwargs):
         uid = self.kwargs.get(self.lookup_url_kwarg)
-        queryset = BlogPost.objects.filter(is_draft=False, author=uid).order_by('-date_published')
+        queryset = BlogPost.objects.for_viewer(self.request.user).filter(
+            is_draft=False, author=uid
+        ).order_by('-date_published', '-id')
 
         return queryset
 
 
-@api_view(["GET"])
-@permission_classes((IsAuthenticated,))
-def api_detail_blog_view(request, post_id):
+def load_public_post(post_id):
+    """
+    The cached part of the published post `post_id` that is the same for
+    every viewer, or None.
+    """
+    def load_post():
+        blog_post = BlogPost.objects.filter(id=post_id, is_draft=False).first()
+        if blog_post is None:
+            return None
+        return dict(BlogPostPublicSerializer(blog_post).data)
+
+    return post_cache.get(post_id, load_post)
+
+
+def is_liked_by(post_id, user):
+    return BlogPost.likes.through.objects.filter(blogpost=post_id, account=user).exists()
+
+
+@async_api_view
+async def api_detail_blog_view(request, post_id):
     data = {}
 
     try:
-        blog_post = BlogPost.objects.get(id=post_id, is_draft=False)
-    except BlogPost.DoesNotExist:
+        post_id = uuid.UUID(post_id)
+    except ValueError:
+        post_id = None
+
+    payload = None
+    if post_id is not None:
+        # Whether the post is liked does not depend on the post being
+        # loaded, so both are fetched at once.
+        payload, is_liked = await asyncio.gather(
+            database_sync_to_async(load_public_post)(post_id),
+            database_sync_to_async(is_liked_by)(post_id, request.user),
+        )
+    if payload is None:
         data['response'] = "error"
         data["message"] = "Post doesn't found."
         return Response(data=data, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = BlogPostSerializer(blog_post, context={'request': request})
+    data = dict(payload)
+    # The author part is not taken from the cached payload, so that it never
+    # lags behind the author's card.
+    card = await database_sync_to_async(user_cards.get)(data['author_id'])
+    data['author_name'] = card.full_name
+    data['author_username'] = card.username
+    data['profile_pic_url'] = card.profile_picture(request)
+    if data['image']:
+        data['image'] = request.build_absolute_uri(data['image'])
+    data['image_renditions'] = {
+        rendition: request.build_absolute_uri(url) for rendition, url in data['image_renditions'].items()
+    }
+    data['is_liked'] = is_liked
 
-    if request.method == "GET":
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    data["response"] = "error"
-    data["message"] = serializer.errors
-    return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(["PUT"])
@@ -152,12 +237,7 @@ def api_like_toggle_view(request, post_id):
         return Response(data=data, status=status.HTTP_404_NOT_FOUND)
 
     if request.user.is_authenticated:
-        if request.user in blog_post.likes.all():
-            blog_post.likes.remove(request.user)
-            liked = False
-        else:
-            blog_post.likes.add(request.user)
-            liked = True
+        liked = blog_post.toggle_like(request.user)
 
         updated = True
 
@@ -204,3 +284,99 @@ def api_is_author_of_blogpost(request, post_id):
     data["response"] = "success"
     data['message'] = "You have permission to edit this post."
     return Response(data=data, status=status.HTTP_200_OK)
+
+
+def parse_post_ids(raw_ids):
+    """
+    Parses a list or comma separated string of post ids. Returns None if any
+    of them is not a valid id or there are more than BATCH_MAX_POSTS.
+    """
+    if isinstance(raw_ids, str):
+        raw_ids = [raw_id for raw_id in raw_ids.split(',') if raw_id]
+
+    try:
+        post_ids = list(dict.fromkeys(uuid.UUID(str(raw_id)) for raw_id in raw_ids))
+    except (TypeError, ValueError):
+        return None
+
+    if not post_ids or len(post_ids) > settings.BATCH_MAX_POSTS:
+        return None
+    return post_ids
+
+
+@api_view(["GET"])
+@permission_classes((IsAuthenticated,))
+def api_batch_detail_blog_view(request):
+    data = {}
+
+    post_ids = parse_post_ids(request.query_params.get('ids', ''))
+    if post_ids is None:
+        data['response'] = "error"
+        data["message"] = "Provide between 1 and {max} valid post ids.".format(max=settings.BATCH_MAX_POSTS)
+        return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+    blog_posts = BlogPost.objects.for_viewer(request.user).filter(is_draft=False).in_bulk(post_ids)
+    serializer = BlogPostSerializer(
+        [blog_posts[post_id] for post_id in post_ids if post_id in blog_posts],
+        many=True,
+        context={'request': request}
+    )
+
+    data['results'] = serializer.data
+    data['missing'] = [post_id for post_id in post_ids if post_id not in blog_posts]
+    return Response(data=data, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes((IsAuthenticated,))
+def api_batch_create_blog_view(request):
+    data = {}
+
+    titles = request.data.getlist('title') if hasattr(request.data, 'getlist') else []
+    images = request.FILES.getlist('image')
+    if not titles or len(titles) != len(images) or len(titles) > settings.BATCH_MAX_POSTS:
+        data['response'] = "error"
+        data["message"] = "Provide between 1 and {max} posts, each with a title and an image.".format(
+            max=settings.BATCH_MAX_POSTS
+        )
+        return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = BlogPostBatchCreateSerializer(data=[
+        {'title': title, 'image': image} for title, image in zip(titles, images)
+    ], many=True)
+
+    if serializer.is_valid():
+        blog_posts = BlogPost.objects.bulk_create_posts([
+            BlogPost(author=request.user, title=post['title'], image=post['image'])
+            for post in serializer.validated_data
+        ])
+        data['response'] = "success"
+        data['message'] = "Posts created successfully."
+        data['ids'] = [blog_post.id for blog_post in blog_posts]
+        return Response(data=data, status=status.HTTP_201_CREATED)
+    data["response"] = "error"
+    data["message"] = serializer.errors
+    return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["DELETE"])
+@permission_classes((IsAuthenticated,))
+def api_batch_delete_blog_view(request):
+    data = {}
+
+    post_ids = parse_post_ids(request.data.get('ids') or request.query_params.get('ids', ''))
+    if post_ids is None:
+        data['response'] = "error"
+        data["message"] = "Provide between 1 and {max} valid post ids.".format(max=settings.BATCH_MAX_POSTS)
+        return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        blog_posts = BlogPost.objects.filter(id__in=post_ids, author=request.user, is_draft=False)
+        deleted_ids = set(blog_posts.values_list('id', flat=True))
+        BlogPost.objects.filter(id__in=deleted_ids).delete()
+
+    data['response'] = "success"
+    data["message"] = "Posts deleted successfully."
+    data['deleted'] = [post_id for post_id in post_ids if post_id in deleted_ids]
+    data['not_deleted'] = [post_id for post_id in post_ids if post_id not in deleted_ids]
+    return Response(data=data, status=status.HTTP_200_OK)
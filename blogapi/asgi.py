@@ -2,6 +2,9 @@
 ASGI config for blogapi project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django, WebSocket connections to CHAT_WEBSOCKET_PATH go
+to the chat endpoint. In production it is served by Gunicorn with Uvicorn
+workers, see the Procfile.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -13,4 +16,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogapi.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once get_asgi_application() has set up the apps.
+from django.conf import settings  # noqa: E402
+from chats.consumers import chat_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'websocket':
+        return await django_application(scope, receive, send)
+
+    if scope['path'] == settings.CHAT_WEBSOCKET_PATH:
+        return await chat_application(scope, receive, send)
+
+    # Rejects the handshake of any other WebSocket path.
+    message = await receive()
+    if message['type'] == 'websocket.connect':
+        await send({'type': 'websocket.close'})
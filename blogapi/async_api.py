@@ -0,0 +1,142 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Page
+from django.db import close_old_connections
+from rest_framework import exceptions, status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from account.utils import ExpiringTokenAuthentication
+
+ALLOWED_METHODS = ('GET',)
+
+
+@functools.lru_cache(maxsize=None)
+def get_database_executor():
+    """
+    The ASYNC_DB_THREADS threads of this process that the async views query
+    the database from. Each keeps its own connection.
+    """
+    return ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='async-db')
+
+
+def database_sync_to_async(func):
+    """
+    Runs `func`, which uses the ORM, in a thread of the database executor.
+    Calls are not serialized on one thread, so independent ones awaited
+    together run concurrently, each on the connection of its own thread.
+    Connections past CONN_MAX_AGE are closed before and after, as around a
+    request.
+    """
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        call = sync_to_async(inner, thread_sensitive=False, executor=get_database_executor())
+        return await call(*args, **kwargs)
+
+    return wrapper
+
+
+@database_sync_to_async
+def authenticate(request):
+    return ExpiringTokenAuthentication().authenticate(request)
+
+
+def finalize_response(response):
+    # What APIView.finalize_response sets, for JSON only.
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = response.accepted_renderer.media_type
+    response.renderer_context = {}
+    return response
+
+
+def error_response(exc):
+    response = Response({'detail': exc.detail}, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response['WWW-Authenticate'] = ExpiringTokenAuthentication.keyword
+    elif isinstance(exc, exceptions.MethodNotAllowed):
+        response['Allow'] = ", ".join(ALLOWED_METHODS)
+    return finalize_response(response)
+
+
+def async_api_view(view):
+    """
+    Turns `view`, a coroutine returning a Response, into an async view of
+    GET requests by authenticated users, like `@api_view(["GET"])` with
+    IsAuthenticated. The view gets a DRF Request and its response is
+    rendered as JSON.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method not in ALLOWED_METHODS:
+                raise exceptions.MethodNotAllowed(request.method)
+
+            request = Request(request)
+            user_auth = await authenticate(request)
+            if user_auth is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = user_auth
+
+            response = await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+        return finalize_response(response)
+
+    # As APIView.as_view does; csrf_exempt() would hide that it is async.
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination whose COUNT(*) and page queries run concurrently.
+    Its responses are those of PageNumberPagination.
+    """
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param, 1)
+
+        count = database_sync_to_async(queryset.count)
+        if page_number in self.last_page_strings:
+            # The last page is only known from the count.
+            paginator.count = await count()
+            number = paginator.num_pages
+            objects = await database_sync_to_async(list)(queryset[(number - 1) * page_size:number * page_size])
+        else:
+            try:
+                number = int(page_number)
+            except (TypeError, ValueError):
+                raise self.invalid_page(page_number)
+            if number < 1:
+                raise self.invalid_page(page_number)
+
+            # Whether the page exists is checked against the count afterwards.
+            paginator.count, objects = await asyncio.gather(
+                count(),
+                database_sync_to_async(list)(queryset[(number - 1) * page_size:number * page_size]),
+            )
+            if number > paginator.num_pages:
+                raise self.invalid_page(page_number)
+
+        self.page = Page(objects, number, paginator)
+        return objects
+
+    def invalid_page(self, page_number):
+        return exceptions.NotFound(self.invalid_page_message.format(page_number=page_number))
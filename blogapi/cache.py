@@ -0,0 +1,69 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class VersionedCache:
+    """
+    Read-through cache of per-object payloads.
+
+    Every object has a version number stored under its own key; payloads are
+    cached under the current version, so bumping the version (`invalidate`)
+    makes the old payload unreachable without having to delete it. Works with
+    any backend of Django's cache framework.
+    """
+
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def version_key(self, pk):
+        return "{prefix}:{pk}:version".format(prefix=self.prefix, pk=pk)
+
+    def payload_key(self, pk, version):
+        return "{prefix}:{pk}:{version}".format(prefix=self.prefix, pk=pk, version=version)
+
+    def get_version(self, pk):
+        key = self.version_key(pk)
+        version = cache.get(key)
+        if version is None:
+            # Start from the clock so a version key evicted from the cache never
+            # resolves to a payload cached before the eviction.
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def invalidate(self, pk):
+        try:
+            cache.incr(self.version_key(pk))
+        except ValueError:
+            # No version yet, so nothing can be cached for this object.
+            pass
+
+    def get(self, pk, loader):
+        """
+        Returns the cached payload of `pk`, calling `loader()` to build and
+        cache it on a miss. A `loader` returning None is not cached.
+        """
+        key = self.payload_key(pk, self.get_version(pk))
+        payload = cache.get(key)
+
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if payload is None:
+            payload = loader()
+            if payload is not None:
+                cache.set(key, payload, timeout=self.timeout)
+        return payload
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,272 @@
+import re
+import uuid
+
+from django.db import connection, transaction
+from rest_framework.filters import SearchFilter
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Wrap the matches in search snippets. Ordinary text holds no control
+# characters, so callers can escape a snippet and then mark the matches up.
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+
+class FullTextIndex:
+    """
+    A full-text index kept in its own table next to `model`.
+
+    PostgreSQL stores a tsvector per object behind a GIN index, SQLite uses an
+    FTS5 virtual table. Other databases are not supported and callers should
+    fall back to plain lookups (see `is_supported`).
+
+    `document` turns an instance into the text that is indexed for it.
+
+    An index with a `scope`, the name of a field of `model` such as its
+    owner, stores that field's value with each document, and searches given
+    a scope value only look at the documents within it. On PostgreSQL this
+    takes the btree_gin extension.
+    """
+
+    def __init__(self, model, table, document, scope=None):
+        self.model = model
+        self.table = table
+        self.document = document
+        self.scope = model._meta.get_field(scope) if scope else None
+
+    @staticmethod
+    def is_supported(using=connection):
+        return using.vendor in ('postgresql', 'sqlite')
+
+    def _pk_value(self, pk, using):
+        return self.model._meta.pk.get_db_prep_value(pk, using)
+
+    def _scope_value(self, value, using):
+        return self.scope.get_db_prep_value(value, using) if value is not None else None
+
+    def _rowid(self, pk):
+        # FTS5 tables can only look rows up by rowid, so the rowid of a
+        # document is derived from its primary key.
+        pk = self.model._meta.pk.to_python(pk)
+        return pk.int >> 65 if isinstance(pk, uuid.UUID) else int(pk)
+
+    def create_schema(self, schema_editor):
+        using = schema_editor.connection
+        table = using.ops.quote_name(self.table)
+
+        if using.vendor == 'postgresql':
+            columns = "object_id {pk_type} PRIMARY KEY, document tsvector NOT NULL".format(
+                pk_type=self.model._meta.pk.db_type(using),
+            )
+            indexed = "document"
+            if self.scope is not None:
+                # One GIN index over both columns, so that a scoped search
+                # only reads the postings of its scope.
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+                columns += ", scope_id {scope_type}".format(scope_type=self.scope.db_type(using))
+                indexed = "scope_id, document"
+
+            schema_editor.execute("CREATE TABLE {table} ({columns})".format(table=table, columns=columns))
+            schema_editor.execute(
+                "CREATE INDEX {index} ON {table} USING gin ({indexed})".format(
+                    index=using.ops.quote_name(self.table + '_gin'), table=table, indexed=indexed,
+                )
+            )
+        elif using.vendor == 'sqlite':
+            # The scope is stored as an indexed token of its own column.
+            columns = "object_id UNINDEXED, scope_id, document" if self.scope is not None else "object_id UNINDEXED, document"
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE {table} USING fts5({columns})".format(table=table, columns=columns)
+            )
+
+    def drop_schema(self, schema_editor):
+        if self.is_supported(schema_editor.connection):
+            schema_editor.execute("DROP TABLE IF EXISTS {table}".format(
+                table=schema_editor.connection.ops.quote_name(self.table)
+            ))
+
+    def update(self, instances, using=connection):
+        """
+        Indexes (or re-indexes) `instances`.
+        """
+        if not self.is_supported(using):
+            return
+
+        if self.scope is None:
+            rows = [(self._pk_value(instance.pk, using), self.document(instance)) for instance in instances]
+            columns, values, updates = "object_id, document", "%s, {document}", "document = EXCLUDED.document"
+        else:
+            rows = [(
+                self._pk_value(instance.pk, using),
+                self._scope_value(getattr(instance, self.scope.attname), using),
+                self.document(instance),
+            ) for instance in instances]
+            columns, values = "object_id, scope_id, document", "%s, %s, {document}"
+            updates = "scope_id = EXCLUDED.scope_id, document = EXCLUDED.document"
+        if not rows:
+            return
+
+        table = using.ops.quote_name(self.table)
+        with using.cursor() as cursor:
+            if using.vendor == 'postgresql':
+                cursor.executemany(
+                    "INSERT INTO {table} ({columns}) VALUES ({values}) "
+                    "ON CONFLICT (object_id) DO UPDATE SET {updates}".format(
+                        table=table, columns=columns, updates=updates,
+                        values=values.format(document="to_tsvector('simple', %s)"),
+                    ),
+                    rows,
+                )
+            else:
+                rowids = [self._rowid(row[0]) for row in rows]
+                cursor.executemany(
+                    "DELETE FROM {table} WHERE rowid = %s".format(table=table),
+                    [(rowid,) for rowid in rowids],
+                )
+                cursor.executemany(
+                    "INSERT INTO {table} (rowid, {columns}) VALUES (%s, {values})".format(
+                        table=table, columns=columns, values=values.format(document="%s"),
+                    ),
+                    [(rowid,) + row for rowid, row in zip(rowids, rows)],
+                )
+
+    def remove(self, pks, using=connection):
+        if not self.is_supported(using):
+            return
+
+        table = using.ops.quote_name(self.table)
+        with using.cursor() as cursor:
+            if using.vendor == 'postgresql':
+                cursor.executemany(
+                    "DELETE FROM {table} WHERE object_id = %s".format(table=table),
+                    [(self._pk_value(pk, using),) for pk in pks],
+                )
+            else:
+                cursor.executemany(
+                    "DELETE FROM {table} WHERE rowid = %s".format(table=table),
+                    [(self._rowid(pk),) for pk in pks],
+                )
+
+    def clear(self, using=connection):
+        with using.cursor() as cursor:
+            cursor.execute("DELETE FROM {table}".format(table=using.ops.quote_name(self.table)))
+
+    def rebuild(self, queryset, batch_size=1000, using=connection):
+        """
+        Empties the index and re-indexes every object of `queryset` in
+        batches. Returns the number of indexed objects.
+        """
+        count = 0
+        batch = []
+        with transaction.atomic(using=using.alias):
+            self.clear(using)
+
+            for instance in queryset.iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) >= batch_size:
+                    self.update(batch, using)
+                    count += len(batch)
+                    batch = []
+            self.update(batch, using)
+
+        return count + len(batch)
+
+    @staticmethod
+    def parse_query(query, using=connection):
+        """
+        Turns user input into a prefix query matching every term, or None if
+        the input holds no searchable terms.
+        """
+        terms = TOKEN_RE.findall(query.lower())
+        if not terms:
+            return None
+
+        if using.vendor == 'postgresql':
+            return ' & '.join("{term}:*".format(term=term) for term in terms)
+        return ' '.join('"{term}"*'.format(term=term) for term in terms)
+
+    def search(self, queryset, query, using=connection, scope=None, rank=True, snippet_field=None):
+        """
+        Restricts `queryset` to objects matching `query`. With `rank`, orders
+        them by relevance, best match first, as the `search_rank` annotation;
+        otherwise the order of `queryset` is kept.
+
+        `scope` limits the search to the documents of one scope value. With
+        `snippet_field`, the name of the indexed text field, an excerpt around
+        the matches is annotated as `search_snippet`, with each match between
+        SNIPPET_START and SNIPPET_END.
+        """
+        parsed_query = self.parse_query(query, using)
+        if parsed_query is None:
+            return queryset
+
+        table = using.ops.quote_name(self.table)
+        outer_table = using.ops.quote_name(self.model._meta.db_table)
+        join = "{table}.object_id = {outer_table}.{outer_pk}".format(
+            table=table, outer_table=outer_table, outer_pk=using.ops.quote_name(self.model._meta.pk.column),
+        )
+        where, params = [join], []
+        select, select_params = {}, []
+
+        if using.vendor == 'postgresql':
+            if scope is not None:
+                where.append("{table}.scope_id = %s".format(table=table))
+                params.append(self._scope_value(scope, using))
+            where.append("{table}.document @@ to_tsquery('simple', %s)".format(table=table))
+            params.append(parsed_query)
+
+            if rank:
+                select['search_rank'] = "ts_rank({table}.document, to_tsquery('simple', %s))".format(table=table)
+                select_params.append(parsed_query)
+            if snippet_field:
+                select['search_snippet'] = "ts_headline('simple', {outer_table}.{column}, " \
+                                           "to_tsquery('simple', %s), %s)".format(
+                    outer_table=outer_table, column=using.ops.quote_name(self.model._meta.get_field(snippet_field).column),
+                )
+                select_params += [parsed_query, 'StartSel={start}, StopSel={end}, MaxWords=20, MinWords=8'.format(
+                    start=SNIPPET_START, end=SNIPPET_END,
+                )]
+        else:
+            if self.scope is not None:
+                # Column filters keep the terms from matching the scope column.
+                parsed_query = "document : ({query})".format(query=parsed_query)
+                if scope is not None:
+                    parsed_query = '"{scope}" AND {query}'.format(
+                        scope=self._scope_value(scope, using), query=parsed_query,
+                    )
+                    parsed_query = "scope_id : " + parsed_query
+            where.append("{table} MATCH %s".format(table=table))
+            params.append(parsed_query)
+
+            if rank:
+                select['search_rank'] = "-bm25({table})".format(table=table)
+            if snippet_field:
+                select['search_snippet'] = "snippet({table}, {column}, %s, %s, '…', 16)".format(
+                    table=table, column=2 if self.scope is not None else 1,
+                )
+                select_params += [SNIPPET_START, SNIPPET_END]
+
+        # A plain join lets the database drive the query from the index and
+        # rank each match in the same pass.
+        queryset = queryset.extra(
+            tables=[self.table], where=where, params=params, select=select or None, select_params=select_params,
+        )
+        if rank:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter backed by the view's `search_index`. Falls back to the
+    `search_fields` lookups of SearchFilter where full-text search is not
+    available.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_index = getattr(view, 'search_index', None)
+        if search_index is None or not search_index.is_supported():
+            return super().filter_queryset(request, queryset, view)
+
+        query = request.query_params.get(self.search_param, '')
+        return search_index.search(queryset, query)
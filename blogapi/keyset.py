@@ -0,0 +1,68 @@
+import uuid
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+
+INVALID_CURSOR = "Invalid cursor"
+
+
+def encode_cursor(position):
+    """
+    Encodes a (datetime, uuid) keyset position into an opaque cursor.
+    """
+    timestamp, pk = position
+    raw = "{timestamp}|{pk}".format(timestamp=timestamp.isoformat(), pk=pk)
+    return b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by `encode_cursor`. Returns None when no cursor is
+    given and raises NotFound for a malformed one, like DRF's CursorPagination.
+    """
+    if not cursor:
+        return None
+
+    try:
+        timestamp, pk = b64decode(cursor.encode('ascii')).decode('ascii').split('|')
+        position = (parse_datetime(timestamp), uuid.UUID(pk))
+    except (TypeError, ValueError, UnicodeError, BinasciiError):
+        raise NotFound(INVALID_CURSOR)
+
+    if position[0] is None:
+        raise NotFound(INVALID_CURSOR)
+    return position
+
+
+def before(position, date_field, pk_field):
+    """
+    Keyset condition selecting the rows strictly after `position` in
+    descending (date, pk) order.
+    """
+    # The leading range on the date alone lets the database bound the index
+    # scan, the OR only breaks ties within it.
+    timestamp, pk = position
+    return Q(**{date_field + '__lte': timestamp}) & (
+        Q(**{date_field + '__lt': timestamp}) | Q(**{pk_field + '__lt': pk})
+    )
+
+
+def after(position, date_field, pk_field):
+    """
+    Keyset condition selecting the rows strictly after `position` in
+    ascending (date, pk) order.
+    """
+    timestamp, pk = position
+    return Q(**{date_field + '__gte': timestamp}) & (
+        Q(**{date_field + '__gt': timestamp}) | Q(**{pk_field + '__gt': pk})
+    )
+
+
+def cursor_url(request, position, cursor_query_param='cursor'):
+    if position is None:
+        return None
+    return replace_query_param(request.build_absolute_uri(), cursor_query_param, encode_cursor(position))
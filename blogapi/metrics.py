@@ -0,0 +1,267 @@
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from blog.models import post_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # SECONDS
+
+UNRESOLVED = "unresolved"
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets, as Prometheus exposes them.
+    Not thread-safe on its own; see `MetricsRegistry`.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.response_bytes = 0
+
+
+class RequestTimings:
+    """
+    Where the time of one request went. Queries are added by `execute`, from
+    whichever thread runs them: async views run theirs concurrently, so the
+    database time can exceed the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db = 0.0
+        self.db_queries = 0
+        self.render = 0.0
+        self._render_started = None
+        self._lock = threading.Lock()
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.db += elapsed
+                self.db_queries += 1
+
+    def render_started(self):
+        self._render_started = time.perf_counter()
+
+    def render_finished(self, response):
+        if self._render_started is not None:
+            self.render = time.perf_counter() - self._render_started
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    @property
+    def view(self):
+        # Serializers run inside the views, so their time is counted here.
+        return max(self.total - self.db - self.render, 0.0)
+
+    def server_timing(self):
+        return 'db;dur={db:.1f};desc="{queries} queries", view;dur={view:.1f}, render;dur={render:.1f}, ' \
+               'total;dur={total:.1f}'.format(
+                   db=self.db * 1000, queries=self.db_queries, view=self.view * 1000, render=self.render * 1000,
+                   total=self.total * 1000,
+               )
+
+
+class MetricsRegistry:
+    """
+    Request metrics of this process, by URL name. Each worker process keeps
+    its own; Prometheus is expected to scrape and sum them per instance.
+    """
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name, timings, response_bytes):
+        with self._lock:
+            metrics = self._views.get(view_name)
+            if metrics is None:
+                metrics = self._views[view_name] = ViewMetrics()
+            metrics.latency.observe(timings.total)
+            metrics.db_queries += timings.db_queries
+            metrics.db_seconds += timings.db
+            metrics.render_seconds += timings.render
+            metrics.response_bytes += response_bytes
+
+    def render(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                "# HELP blogapi_request_duration_seconds Request latency by URL name.",
+                "# TYPE blogapi_request_duration_seconds histogram",
+            ]
+            for name, metrics in views:
+                for bound, count in metrics.latency.cumulative_counts():
+                    lines.append('blogapi_request_duration_seconds_bucket{{view="{view}",le="{le}"}} {count}'.format(
+                        view=name, le='+Inf' if bound == float('inf') else bound, count=count,
+                    ))
+                lines.append('blogapi_request_duration_seconds_sum{{view="{view}"}} {value}'.format(
+                    view=name, value=metrics.latency.sum,
+                ))
+                lines.append('blogapi_request_duration_seconds_count{{view="{view}"}} {value}'.format(
+                    view=name, value=metrics.latency.count,
+                ))
+
+            for metric, help_text, attribute in (
+                ('blogapi_request_db_queries_total', "Database queries by URL name.", 'db_queries'),
+                ('blogapi_request_db_duration_seconds_total', "Database time by URL name.", 'db_seconds'),
+                ('blogapi_request_render_duration_seconds_total', "Response rendering time by URL name.",
+                 'render_seconds'),
+                ('blogapi_response_size_bytes_total', "Response body bytes by URL name.", 'response_bytes'),
+            ):
+                lines.append("# HELP {metric} {help}".format(metric=metric, help=help_text))
+                lines.append("# TYPE {metric} counter".format(metric=metric))
+                for name, metrics in views:
+                    lines.append('{metric}{{view="{view}"}} {value}'.format(
+                        metric=metric, view=name, value=getattr(metrics, attribute),
+                    ))
+        return lines
+
+
+registry = MetricsRegistry()
+
+# The timings of the request being handled. Context variables follow the
+# request into the threads sync_to_async runs its database work in.
+current_timings = ContextVar('current_timings', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.execute(execute, sql, params, many, context)
+
+
+def instrument(sender=None, connection=None, **kwargs):
+    """
+    Installs `record_query` on `connection`, once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(instrument)
+
+
+class MetricsMiddleware:
+    """
+    Times every request, its database queries and the rendering of its
+    response, reports them in a `Server-Timing` header and adds them to the
+    metrics of the URL name the request resolved to. Works both under WSGI
+    and ASGI, so that async views are not run through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Lets the handler await this middleware, as MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        # Connections opened before this middleware was loaded.
+        for connection in connections.all():
+            instrument(connection=connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        timings = request.timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, timings, response)
+
+    async def __acall__(self, request):
+        timings = request.timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, timings, response)
+
+    def finish(self, request, timings, response):
+        timings.finish()
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.url_name if match is not None and match.url_name else UNRESOLVED
+        response_bytes = len(response.content) if not response.streaming else 0
+        registry.record(view_name, timings, response_bytes)
+
+        response['Server-Timing'] = timings.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        request.timings.render_started()
+        response.add_post_render_callback(request.timings.render_finished)
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires `Authorization: Bearer
+    <METRICS_TOKEN>` and is only served when METRICS_TOKEN is set, or in
+    DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), "Bearer " + token):
+        return HttpResponseForbidden()
+
+    lines = registry.render()
+    cache_stats = post_cache.stats()
+    for outcome in ('hits', 'misses'):
+        metric = 'blogapi_post_cache_{outcome}_total'.format(outcome=outcome)
+        lines += [
+            "# HELP {metric} Post cache {outcome} of this process.".format(metric=metric, outcome=outcome),
+            "# TYPE {metric} counter".format(metric=metric),
+            "{metric} {value}".format(metric=metric, value=cache_stats[outcome]),
+        ]
+
+    return HttpResponse("\n".join(lines) + "\n", content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,174 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.images import get_image_dimensions
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS,
+            thread_name_prefix='renditions',
+        )
+    return _executor
+
+
+def read_dimensions(field_file):
+    """
+    Reads (width, height) of a freshly uploaded image from its header,
+    without decoding the pixels.
+    """
+    try:
+        return get_image_dimensions(field_file.file)
+    except (OSError, ValueError):
+        return None, None
+
+
+def rendition_name(name, rendition):
+    base_name, _ = os.path.splitext(name)
+    return "{base_name}_{rendition}.jpg".format(base_name=base_name, rendition=rendition)
+
+
+def render(field_file):
+    """
+    Decodes the image once and stores a resized JPEG for every entry of
+    IMAGE_RENDITIONS, largest first. Returns ({rendition: storage name},
+    (width, height) of the original).
+    """
+    renditions = {}
+    sizes = sorted(settings.IMAGE_RENDITIONS.items(), key=lambda item: item[1], reverse=True)
+
+    with field_file.open('rb'), Image.open(field_file) as image:
+        dimensions = image.size
+
+        # Lets the JPEG decoder scale down while decoding.
+        image.draft('RGB', (sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+        for rendition, size in sizes:
+            image.thumbnail((size, size), Image.LANCZOS)
+
+            content = BytesIO()
+            image.save(content, 'JPEG', quality=settings.IMAGE_RENDITION_QUALITY, optimize=True, progressive=True)
+            renditions[rendition] = field_file.storage.save(
+                rendition_name(field_file.name, rendition), ContentFile(content.getvalue())
+            )
+
+    return renditions, dimensions
+
+
+def rendition_urls(field_file, renditions, request=None):
+    if not field_file or not renditions:
+        return {}
+
+    urls = {rendition: field_file.storage.url(name) for rendition, name in renditions.items()}
+    if request is not None:
+        urls = {rendition: request.build_absolute_uri(url) for rendition, url in urls.items()}
+    return urls
+
+
+def delete_renditions(field_file, renditions):
+    for name in (renditions or {}).values():
+        field_file.storage.delete(name)
+
+
+def generate(model, pk, field_name='image'):
+    """
+    Renders the renditions of one object and records them, together with the
+    image dimensions, on its row. Returns the updated instance, or None when
+    there is no image or it changed in the meantime.
+
+    The dimensions and renditions are kept in `<field_name>_width`,
+    `<field_name>_height` and `<field_name>_renditions`.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+
+    renditions, (width, height) = render(field_file)
+    fields = {
+        field_name + '_renditions': renditions,
+        field_name + '_width': width,
+        field_name + '_height': height,
+    }
+
+    if not model.objects.filter(pk=pk, **{field_name: field_file.name}).update(**fields):
+        delete_renditions(field_file, renditions)
+        return None
+
+    for name, value in fields.items():
+        setattr(instance, name, value)
+    return instance
+
+
+def process(model, pk, field_name, on_generated):
+    try:
+        instance = generate(model, pk, field_name)
+        if instance is not None and on_generated is not None:
+            on_generated(instance)
+    except Exception:
+        logger.exception("Failed to render %s renditions of %s %s", field_name, model.__name__, pk)
+
+
+def process_in_background(*args):
+    close_old_connections()
+    try:
+        process(*args)
+    finally:
+        close_old_connections()
+
+
+def prepare(instance, field_name='image'):
+    """
+    Called before saving `instance`. If a new image was assigned, records its
+    dimensions, drops the renditions of the previous image and marks the
+    instance for `schedule`.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file or field_file._committed:
+        return
+
+    renditions_field = field_name + '_renditions'
+    stale_renditions = getattr(instance, renditions_field)
+    if stale_renditions:
+        transaction.on_commit(lambda: delete_renditions(field_file, stale_renditions))
+
+    width, height = read_dimensions(field_file)
+    setattr(instance, field_name + '_width', width)
+    setattr(instance, field_name + '_height', height)
+    setattr(instance, renditions_field, {})
+    instance._renditions_pending = True
+
+
+def schedule(instance, field_name='image', on_generated=None):
+    """
+    Called after saving `instance`. Renders the renditions marked by `prepare`
+    on a background thread once the current transaction commits, or inline
+    when IMAGE_RENDITION_WORKERS is 0. `on_generated(instance)` is called
+    after the renditions are recorded.
+    """
+    if not getattr(instance, '_renditions_pending', False):
+        return
+    instance._renditions_pending = False
+
+    args = (type(instance), instance.pk, field_name, on_generated)
+
+    if settings.IMAGE_RENDITION_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(process_in_background, *args))
+    else:
+        transaction.on_commit(lambda: process(*args))
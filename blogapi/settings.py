@@ -1,6 +1,7 @@
 import os
 
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,7 +24,6 @@ INSTALLED_APPS = [
     'storages',
 
     'rest_framework',
-    'rest_framework.authtoken',
     'account',
     'blog',
     'chats',
@@ -41,13 +41,55 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+ASYNC_DB_THREADS = 10  # THREADS, EACH WITH A DATABASE CONNECTION, THE ASYNC VIEWS QUERY FROM PER PROCESS
+
 TOKEN_EXPIRED_AFTER_SECONDS = 604800  # VALID FOR 7 DAYS
+TOKEN_RENEW_AFTER_SECONDS = 86400  # EXTEND A TOKEN IN USE AT MOST ONCE A DAY
+TOKEN_CACHE_SIZE = 10000  # TOKENS KEPT IN MEMORY PER PROCESS
+TOKEN_CACHE_TIMEOUT = 3600  # SECONDS A TOKEN STAYS IN THE SHARED CACHE
+TOKEN_CACHE_LOCAL_TIMEOUT = 30  # SECONDS A PROCESS KEEPS ITS OWN COPY OF A TOKEN
+
+AVAILABILITY_MAX_CANDIDATES = 50  # NAMES PER AVAILABILITY REQUEST
+AVAILABILITY_BLOOM_ERROR_RATE = 0.01  # FALSE POSITIVE RATE OF THE NAME FILTERS
+AVAILABILITY_BLOOM_MAX_AGE = 900  # SECONDS BETWEEN FILTER REBUILDS, 0 DISABLES THEM
+AVAILABILITY_BLOOM_CHECK_INTERVAL = 10  # SECONDS BETWEEN CHECKS FOR FILTERS BUILT BY ANOTHER PROCESS
+AVAILABILITY_BLOOM_CHUNK_SIZE = 512 * 1024  # BYTES PER CACHE ENTRY OF THE SHARED FILTERS, BELOW MEMCACHED'S 1 MB
+
+IMAGE_RENDITIONS = {  # LONGEST SIDE IN PIXELS
+    'thumbnail': 150,
+    'feed': 640,
+    'full': 1280,
+}
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_WORKERS = 2  # 0 RENDERS INLINE AFTER COMMIT
+
+BATCH_MAX_POSTS = 50  # POSTS PER BATCH REQUEST
+
+POST_CACHE_TIMEOUT = 3600  # SERIALIZED POSTS ARE CACHED FOR 1 HOUR
+USER_CARD_CACHE_TIMEOUT = 3600  # AUTHOR CARDS ARE CACHED FOR 1 HOUR
+
+CHAT_WEBSOCKET_PATH = '/ws/chats/'  # SERVED BY blogapi.asgi
+if DEBUG:
+    CHAT_CHANNEL_LAYER = 'chats.layers.InMemoryChannelLayer'  # SINGLE PROCESS ONLY
+else:
+    CHAT_CHANNEL_LAYER = 'chats.layers.PostgresChannelLayer'  # SHARED BY ALL PROCESSES
+CHAT_SUBSCRIPTION_MAX_SIZE = 100  # MESSAGES BUFFERED PER CONNECTION BEFORE IT IS CLOSED
+CHAT_SYNC_PAGE_SIZE = 100  # MESSAGES PER SYNC RESPONSE
+CHAT_RETENTION_DAYS = 180  # OLDER MESSAGES ARE MOVED TO THE ARCHIVE BY archive_chats
+CHAT_ARCHIVE_BATCH_SIZE = 1000  # MESSAGES ARCHIVED PER TRANSACTION
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # BEARER TOKEN OF THE /metrics SCRAPER, ENDPOINT DISABLED WHEN UNSET
+
+FEED_MAX_LENGTH = 800  # ENTRIES KEPT PER HOME TIMELINE
+FEED_BACKFILL_LENGTH = 50  # POSTS COPIED WHEN FOLLOWING AN AUTHOR
+FEED_FAN_OUT_MAX_FOLLOWERS = 10000  # ABOVE THIS, POSTS ARE MERGED AT READ TIME
 
 AUTH_USER_MODEL = 'account.Account'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 MIDDLEWARE = [
+    'blogapi.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +131,19 @@ DATABASES = {
     }
 }
 
+# TOKENS, POSTS, AUTHOR CARDS AND COUNTERS ARE CACHED HERE AND INVALIDATED BY
+# WHICHEVER PROCESS CHANGES THEM, SO OUTSIDE DEBUG CACHE_BACKEND MUST NAME A
+# CACHE SHARED BY ALL PROCESSES, SUCH AS REDIS OR MEMCACHED.
+if not DEBUG and not os.getenv('CACHE_BACKEND'):
+    raise ImproperlyConfigured("Set CACHE_BACKEND and CACHE_LOCATION to a Redis or memcached cache.")
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -128,6 +183,11 @@ EMAIL_PORT = 465
 EMAIL_USE_SSL = True
 EMAIL_USE_TLS = False
 
+EMAIL_QUEUE_BATCH_SIZE = 50  # MESSAGES SENT PER SMTP CONNECTION
+EMAIL_QUEUE_LEASE = 300  # SECONDS A CLAIMED MESSAGE IS HIDDEN FROM OTHER WORKERS
+EMAIL_QUEUE_MAX_ATTEMPTS = 6  # THEN THE MESSAGE IS MARKED DEAD
+EMAIL_QUEUE_RETRY_DELAY = 60  # SECONDS, DOUBLED AFTER EVERY FAILED ATTEMPT
+
 PASSWORD_RESET_TIMEOUT_DAYS = 1
 
 if DEBUG:
@@ -3,10 +3,14 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from blogapi.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('account/', include('account.urls')),
     path('chats/', include('chats.urls')),
+    path('feeds/', include('feeds.urls')),
     path('', include('blog.urls')),
 ]
 
@@ -1,12 +1,44 @@
 from django.contrib import admin
 from django.contrib.admin import site
+from django.db.models import Q
 
-from chats.models import Chats
+from chats.models import ChatArchiveSegment, Chats, Conversation, search_index
 
 
 class ChatAdmin(admin.ModelAdmin):
     model = Chats
     search_fields = ['message', 'user__username']
 
+    def get_search_fields(self, request):
+        # The message index replaces a LIKE scan over every message.
+        if search_index.is_supported():
+            return [field for field in self.search_fields if field != 'message']
+        return super().get_search_fields(request)
+
+    def get_search_results(self, request, queryset, search_term):
+        by_fields, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_index.is_supported() or search_index.parse_query(search_term) is None:
+            return by_fields, may_have_duplicates
+
+        by_message = search_index.search(queryset, search_term, rank=False)
+        return queryset.filter(
+            Q(pk__in=by_fields.values('pk')) | Q(pk__in=by_message.values('pk'))
+        ), may_have_duplicates
+
+
+class ConversationAdmin(admin.ModelAdmin):
+    model = Conversation
+    list_display = ['key', 'last_message_at', 'last_message_preview']
+    ordering = ('-last_message_at',)
+
+
+class ChatArchiveSegmentAdmin(admin.ModelAdmin):
+    model = ChatArchiveSegment
+    list_display = ['user', 'month', 'message_count', 'updated_at']
+    raw_id_fields = ['user']
+    ordering = ('-month',)
+
 
 site.register(Chats, ChatAdmin)
+site.register(Conversation, ConversationAdmin)
+site.register(ChatArchiveSegment, ChatArchiveSegmentAdmin)
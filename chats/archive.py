@@ -0,0 +1,152 @@
+import gzip
+import io
+import json
+import uuid
+from itertools import groupby, islice
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+from chats.models import ChatArchiveSegment, Chats
+from chats.serializers import ChatSerializer
+
+
+def segment_month(sent_at):
+    """
+    The month of the segment a message sent at `sent_at` is archived in.
+    """
+    return sent_at.astimezone(timezone.utc).date().replace(day=1)
+
+
+def encode_messages(entries):
+    """
+    One gzip member holding `entries`, messages as ChatSerializer renders
+    them, as NDJSON. Members can be concatenated and still read as one gzip
+    stream.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as archive:
+        for message in entries:
+            line = json.dumps(message, cls=JSONEncoder, separators=(',', ':'))
+            archive.write(line.encode('utf-8') + b'\n')
+    return buffer.getvalue()
+
+
+def message_position(message):
+    return parse_datetime(message['sent_at']), uuid.UUID(message['id'])
+
+
+def read_segment(segment):
+    """
+    The messages of `segment` as ChatSerializer renders them, oldest first.
+    """
+    with segment.file.open('rb') as f, gzip.GzipFile(fileobj=f, mode='rb') as archive:
+        return [json.loads(line) for line in archive]
+
+
+def read_segment_before(segment, position):
+    """
+    The messages of `segment` sent before `position`, newest first. Members
+    are decompressed one at a time, from the last one that can hold any, so
+    reading stops with the consumer.
+    """
+    if not segment.members:
+        # Written before members were indexed, in no guaranteed order.
+        for entry in sorted(read_segment(segment), key=message_position, reverse=True):
+            if position is None or message_position(entry) < position:
+                yield entry
+        return
+
+    ends = [offset for offset, _, _ in segment.members[1:]] + [None]
+    with segment.file.open('rb') as f:
+        for (offset, sent_at, message_id), end in reversed(list(zip(segment.members, ends))):
+            if position is not None and (parse_datetime(sent_at), uuid.UUID(message_id)) >= position:
+                continue
+
+            f.seek(offset)
+            lines = gzip.decompress(f.read() if end is None else f.read(end - offset)).splitlines()
+            for line in reversed(lines):
+                entry = json.loads(line)
+                if position is None or message_position(entry) < position:
+                    yield entry
+
+
+def archive_messages(user_id, chats):
+    """
+    Appends `chats`, messages of `user_id` in the order they were sent, to
+    the segments of their months and deletes them from the table. Each
+    month is written and deleted in its own transaction.
+    """
+    for month, messages in groupby(chats, key=lambda chat: segment_month(chat.sent_at)):
+        messages = list(messages)
+        entries = ChatSerializer(messages, many=True).data
+
+        with transaction.atomic():
+            segment = ChatArchiveSegment.objects.select_for_update().filter(user=user_id, month=month).first()
+            if segment is None:
+                segment = ChatArchiveSegment(user_id=user_id, month=month)
+                previous, members = b'', []
+            elif segment.members and messages[0].sent_at > segment.last_sent_at:
+                with segment.file.open('rb') as f:
+                    previous = f.read()
+                members = segment.members
+            else:
+                # Rewritten as one sorted member, so that members stay in
+                # order and every segment gets indexed.
+                entries = sorted(read_segment(segment) + list(entries), key=message_position)
+                previous, members = b'', []
+            previous_name = segment.file.name
+
+            if not members:
+                segment.first_sent_at = parse_datetime(entries[0]['sent_at'])
+            segment.members = members + [[len(previous), entries[0]['sent_at'], entries[0]['id']]]
+            segment.file.save('segment.ndjson.gz', ContentFile(previous + encode_messages(entries)), save=False)
+            try:
+                segment.message_count += len(messages)
+                segment.last_sent_at = parse_datetime(entries[-1]['sent_at'])
+                segment.save()
+                Chats.objects.filter(pk__in=[chat.pk for chat in messages]).delete()
+            except Exception:
+                segment.file.storage.delete(segment.file.name)
+                raise
+
+            if previous_name:
+                storage = segment.file.storage
+                transaction.on_commit(lambda: storage.delete(previous_name))
+
+
+def archive_user_messages(user_id, cutoff, batch_size):
+    """
+    Archives the messages of `user_id` sent before `cutoff`, `batch_size` at
+    a time. Returns the number of archived messages.
+    """
+    archived = 0
+    while True:
+        batch = list(Chats.objects.filter(user=user_id, sent_at__lt=cutoff).order_by('sent_at', 'id')[:batch_size])
+        if not batch:
+            return archived
+
+        archive_messages(user_id, batch)
+        archived += len(batch)
+
+
+def archived_messages(user_id, position, limit):
+    """
+    Up to `limit` archived messages of `user_id` sent before `position`,
+    newest first, reading only as many segments as needed.
+    """
+    segments = ChatArchiveSegment.objects.filter(user=user_id).order_by('-month')
+    if position is not None:
+        segments = segments.filter(month__lte=segment_month(position[0]))
+
+    messages = []
+    for segment in segments.iterator():
+        entries = read_segment_before(segment, position)
+        messages += islice(entries, limit - len(messages))
+        entries.close()
+        if len(messages) >= limit:
+            break
+    return messages
@@ -0,0 +1,148 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+
+from account.utils import ExpiringTokenAuthentication
+from chats.layers import SlowConsumer, get_channel_layer
+from chats.utils import create_chat_message
+
+CLOSE_UNAUTHORIZED = 4001
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def get_token_key(scope):
+    """
+    The token of a WebSocket handshake, from the `token` query parameter or
+    an `Authorization: Token <key>` header.
+    """
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if query.get('token'):
+        return query['token'][0]
+
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode('latin-1').split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                return parts[1]
+    return None
+
+
+@sync_to_async
+def authenticate(key):
+    close_old_connections()
+    try:
+        user, _ = ExpiringTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+    return user
+
+
+@sync_to_async
+def send_chat_message(user, payload):
+    close_old_connections()
+    try:
+        return create_chat_message(user, payload.get('to'), payload.get('message'), payload.get('timestamp'))
+    finally:
+        close_old_connections()
+
+
+class ChatConnection:
+    """
+    One chat WebSocket connection of an authenticated user.
+
+    Clients send `{"to": <account id>, "message": <text>, "timestamp": ...}`
+    and receive `{"type": "chat.sent", "chat": ...}` for each message they
+    sent, `{"type": "chat.message", "chat": ...}` for each message sent to
+    them while connected and `{"type": "error", "message": ...}` for
+    messages that were rejected. A connection that falls behind by more than
+    CHAT_SUBSCRIPTION_MAX_SIZE messages is closed with code 1013 and should
+    fetch what it missed over HTTP before reconnecting.
+    """
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+
+    async def send(self, message):
+        async with self._send_lock:
+            if not self.closed:
+                await self._send(message)
+                if message['type'] == 'websocket.close':
+                    self.closed = True
+
+    async def send_json(self, payload):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(payload, cls=JSONEncoder)})
+
+    async def close(self, code):
+        await self.send({'type': 'websocket.close', 'code': code})
+
+    async def run(self):
+        message = await self.receive()
+        if message['type'] != 'websocket.connect':
+            return
+
+        key = get_token_key(self.scope)
+        user = await authenticate(key) if key else None
+        if user is None:
+            await self.close(CLOSE_UNAUTHORIZED)
+            return
+
+        await self.send({'type': 'websocket.accept'})
+
+        layer = get_channel_layer()
+        subscription = layer.subscribe(user.pk)
+        writer = asyncio.ensure_future(self.write(subscription))
+        try:
+            await self.read(user)
+        finally:
+            layer.unsubscribe(subscription)
+            writer.cancel()
+
+    async def read(self, user):
+        while True:
+            message = await self.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            if message['type'] != 'websocket.receive':
+                continue
+
+            try:
+                payload = json.loads(message.get('text') or '')
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                await self.send_json({'type': 'error', 'message': "Messages must be JSON objects."})
+                continue
+
+            try:
+                chat = await send_chat_message(user, payload)
+            except ValidationError as e:
+                await self.send_json({'type': 'error', 'message': e.messages[0]})
+                continue
+
+            await self.send_json({'type': 'chat.sent', 'chat': chat})
+
+    async def write(self, subscription):
+        try:
+            while True:
+                await self.send_json(await subscription.get())
+        except SlowConsumer:
+            await self.close(CLOSE_TRY_AGAIN_LATER)
+
+
+async def chat_application(scope, receive, send):
+    """
+    ASGI application of the chat WebSocket endpoint.
+    """
+    await ChatConnection(scope, receive, send).run()
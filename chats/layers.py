@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class SlowConsumer(Exception):
+    """
+    Raised from `Subscription.get` once messages were dropped because the
+    subscriber did not keep up.
+    """
+
+
+class Subscription:
+    """
+    The messages published to one user, for one connection. Buffers at most
+    `max_size` messages; a subscriber falling further behind is cut off
+    instead of buffering without bound.
+    """
+
+    def __init__(self, user_id, max_size, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.overflowed = False
+        self._queue = asyncio.Queue(maxsize=max_size)
+
+    def put(self, message):
+        # Runs on the subscriber's event loop.
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Wakes a pending `get` so it can raise.
+            self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    async def get(self):
+        message = await self._queue.get()
+        if self.overflowed:
+            raise SlowConsumer
+        return message
+
+
+class BaseChannelLayer:
+    """
+    Delivers chat messages to the connections of their recipients.
+
+    `publish` may be called from any thread, including ones without an
+    event loop; `subscribe` and `unsubscribe` from the event loop of the
+    connection.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or settings.CHAT_SUBSCRIPTION_MAX_SIZE
+
+    def subscribe(self, user_id):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, user_id, message):
+        raise NotImplementedError
+
+
+class InMemoryChannelLayer(BaseChannelLayer):
+    """
+    Channel layer for a single process, such as one development server or
+    the tests. Users connected to other processes do not receive anything.
+    """
+
+    def __init__(self, max_size=None):
+        super().__init__(max_size)
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.max_size, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, message):
+        """
+        Publishes `message` to every connection of `user_id`. Returns the
+        number of connections it was handed to.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+
+        delivered = 0
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # The event loop of the connection is already closed.
+                continue
+            delivered += 1
+        return delivered
+
+
+class PostgresChannelLayer(InMemoryChannelLayer):
+    """
+    Channel layer for several processes sharing a PostgreSQL database.
+
+    Messages are published with NOTIFY. Each process with subscribers
+    LISTENs from a background thread, on a connection of its own, and hands
+    the messages to the subscriptions of its connections. Messages published
+    while that connection is being re-established are lost; clients catch up
+    from the sync endpoint.
+    """
+
+    channel = 'chats'
+    # NOTIFY payloads are limited to 8000 bytes; longer messages are sent in
+    # chunks, in one transaction.
+    chunk_size = 7900
+    reconnect_delay = 1
+
+    def __init__(self, max_size=None, using=DEFAULT_DB_ALIAS):
+        super().__init__(max_size)
+        if connections[using].vendor != 'postgresql':
+            raise ImproperlyConfigured("PostgresChannelLayer requires a PostgreSQL database.")
+        self.using = using
+        self._chunks = {}
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        self._start_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, message):
+        """
+        Publishes `message` to every connection of `user_id`, in any process.
+        """
+        # ASCII only, so that characters and bytes count the same.
+        payload = json.dumps({'user_id': str(user_id), 'message': message}, cls=DjangoJSONEncoder)
+        chunks = [payload[i:i + self.chunk_size] for i in range(0, len(payload), self.chunk_size)]
+        publish_id = uuid.uuid4().hex
+        with transaction.atomic(using=self.using), connections[self.using].cursor() as cursor:
+            for n, chunk in enumerate(chunks):
+                cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, "{id} {n} {total} {chunk}".format(
+                    id=publish_id, n=n, total=len(chunks), chunk=chunk,
+                )])
+
+    def _start_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='chat-channel-layer', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_until_disconnected()
+            except Exception:
+                logger.exception("Chat channel layer disconnected, reconnecting.")
+            self._chunks.clear()
+            time.sleep(self.reconnect_delay)
+
+    def _listen_until_disconnected(self):
+        wrapper = connections[self.using]
+        connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute("LISTEN {channel}".format(channel=wrapper.ops.quote_name(self.channel)))
+
+            while True:
+                select.select([connection], [], [], 60)
+                connection.poll()
+                while connection.notifies:
+                    self._receive(connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def _receive(self, payload):
+        publish_id, n, total, chunk = payload.split(' ', 3)
+        if total != '1':
+            chunks = self._chunks.setdefault(publish_id, {})
+            chunks[int(n)] = chunk
+            if len(chunks) < int(total):
+                return
+            chunk = ''.join(chunks[i] for i in range(int(total)))
+            del self._chunks[publish_id]
+
+        data = json.loads(chunk)
+        super().publish(uuid.UUID(data['user_id']), data['message'])
+
+
+@lru_cache(maxsize=None)
+def get_channel_layer():
+    """
+    The channel layer configured by CHAT_CHANNEL_LAYER.
+    """
+    return import_string(settings.CHAT_CHANNEL_LAYER)()
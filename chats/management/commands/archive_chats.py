@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chats.archive import archive_user_messages
+
+
+class Command(BaseCommand):
+    help = "Moves chat messages older than the retention period to the per-user monthly archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.CHAT_RETENTION_DAYS,
+            help="Archive messages sent more than this many days ago.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.CHAT_ARCHIVE_BATCH_SIZE,
+            help="Number of messages archived per transaction.",
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help="Seconds to wait after each account with archived messages.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+
+        # Walking the accounts rather than the messages keeps every lookup a
+        # short range scan of the (user, sent_at) index, however much was
+        # already archived.
+        user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+
+        archived = 0
+        for user_id in user_ids.iterator(chunk_size=options['batch_size']):
+            count = archive_user_messages(user_id, cutoff, options['batch_size'])
+            if count:
+                archived += count
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            "Archived {count} messages sent before {cutoff}.".format(count=archived, cutoff=cutoff.isoformat())
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chats',
+            index=models.Index(fields=['user', 'sent_at', 'id'], name='chats_user_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def fold_chats_into_conversations(apps, schema_editor):
+    Account = apps.get_model(settings.AUTH_USER_MODEL)
+    Chats = apps.get_model('chats', 'Chats')
+    Conversation = apps.get_model('chats', 'Conversation')
+    ConversationMember = apps.get_model('chats', 'ConversationMember')
+
+    # Messages whose sender is not an account stay outside of conversations.
+    pairs = Chats.objects.filter(user__isnull=False).values_list('user_id', 'sender').distinct()
+    for user_id, sender in pairs.iterator():
+        try:
+            sender_id = uuid.UUID(sender)
+        except (TypeError, ValueError):
+            continue
+        if not Account.objects.filter(pk=sender_id).exists():
+            continue
+
+        conversation, created = Conversation.objects.get_or_create(
+            key=":".join(sorted([str(user_id), str(sender_id)])),
+        )
+        if created:
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=member_id, peer_id=peer_id)
+                for member_id, peer_id in {(user_id, sender_id), (sender_id, user_id)}
+            ])
+        Chats.objects.filter(user_id=user_id, sender=sender).update(conversation=conversation)
+
+    # The history counts as read.
+    for conversation in Conversation.objects.iterator():
+        last = Chats.objects.filter(conversation=conversation).order_by('-sent_at', '-id').first()
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message_at=last.sent_at,
+            last_message_preview=(last.message or '')[:100],
+            last_sender_id=uuid.UUID(last.sender),
+        )
+        ConversationMember.objects.filter(conversation=conversation).update(last_message_at=last.sent_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chats', '0002_chats_user_sent_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Key')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Message Time')),
+                ('last_message_preview', models.CharField(blank=True, max_length=100, verbose_name='Last Message Preview')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('last_sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Last Sender')),
+            ],
+            options={
+                'verbose_name': 'Conversation',
+                'verbose_name_plural': 'Conversations',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConversationMember',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0, verbose_name='Unread Count')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Message Time')),
+                ('last_read_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Read Time')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='chats.conversation', verbose_name='Conversation')),
+                ('peer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Peer')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Conversation Member',
+                'verbose_name_plural': 'Conversation Members',
+            },
+        ),
+        migrations.AddField(
+            model_name='chats',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chats.conversation', verbose_name='Conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationmember',
+            index=models.Index(fields=['user', 'last_message_at', 'id'], name='chats_member_inbox_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversationmember',
+            constraint=models.UniqueConstraint(fields=('conversation', 'user'), name='chats_member_unique'),
+        ),
+        migrations.RunPython(fold_chats_into_conversations, migrations.RunPython.noop),
+    ]
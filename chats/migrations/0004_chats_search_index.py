@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from blogapi.fulltext import FullTextIndex
+
+
+def search_document(chat):
+    # As chats.models.search_document was when this migration was written.
+    return chat.message or ''
+
+
+def create_search_index(apps, schema_editor):
+    Chats = apps.get_model('chats', 'Chats')
+    search_index = FullTextIndex(Chats, 'chats_chats_search', search_document, scope='user')
+
+    search_index.create_schema(schema_editor)
+    if search_index.is_supported(schema_editor.connection):
+        search_index.rebuild(Chats.objects.only('id', 'user', 'message'), using=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    Chats = apps.get_model('chats', 'Chats')
+    FullTextIndex(Chats, 'chats_chats_search', search_document, scope='user').drop_schema(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_conversations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
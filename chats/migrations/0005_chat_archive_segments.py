@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:55
+
+import chats.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chats', '0004_chats_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchiveSegment',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Month')),
+                ('file', models.FileField(max_length=255, upload_to=chats.models.archive_path, verbose_name='File')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='Message Count')),
+                ('first_sent_at', models.DateTimeField(verbose_name='First Message Time')),
+                ('last_sent_at', models.DateTimeField(verbose_name='Last Message Time')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_archive_segments', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Chat Archive Segment',
+                'verbose_name_plural': 'Chat Archive Segments',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chatarchivesegment',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='chats_archive_segment_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0005_chat_archive_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatarchivesegment',
+            name='members',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Members'),
+        ),
+    ]
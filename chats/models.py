@@ -1,9 +1,182 @@
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, When
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
+from blogapi.fulltext import FullTextIndex
+
+PREVIEW_LENGTH = 100
+
+
+class ConversationManager(models.Manager):
+    @staticmethod
+    def direct_key(user_id, other_user_id):
+        return ":".join(sorted([str(user_id), str(other_user_id)]))
+
+    def between(self, user_id, other_user_id):
+        """
+        Returns the conversation of two accounts, creating it and its members
+        on their first message.
+        """
+        with transaction.atomic():
+            conversation, created = self.get_or_create(key=self.direct_key(user_id, other_user_id))
+            if created:
+                ConversationMember.objects.bulk_create([
+                    ConversationMember(conversation=conversation, user_id=user_id, peer_id=other_user_id),
+                    ConversationMember(conversation=conversation, user_id=other_user_id, peer_id=user_id),
+                ] if user_id != other_user_id else [
+                    ConversationMember(conversation=conversation, user_id=user_id, peer_id=user_id),
+                ])
+        return conversation
+
+    def record_message(self, chat, sender_id):
+        """
+        Updates the preview of the conversation of `chat` and, with a single
+        statement, the inbox entries of its members. The recipient's unread
+        counter goes up by one.
+        """
+        self.filter(pk=chat.conversation_id).update(
+            last_message_at=chat.sent_at,
+            last_message_preview=(chat.message or '')[:PREVIEW_LENGTH],
+            last_sender_id=sender_id,
+        )
+
+        unread_count = F('unread_count')
+        if chat.user_id != sender_id:
+            unread_count = Case(When(user=chat.user_id, then=F('unread_count') + 1), default=F('unread_count'))
+
+        ConversationMember.objects.filter(conversation=chat.conversation_id).update(
+            last_message_at=chat.sent_at,
+            unread_count=unread_count,
+        )
+
+
+class Conversation(models.Model):
+    """
+    The messages exchanged by two accounts, with a preview of the latest one.
+    """
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        primary_key=True,
+        editable=False,
+        auto_created=True,
+        verbose_name=_("ID"),
+    )
+    key = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name=_("Key"),
+    )
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Last Message Time"),
+    )
+    last_message_preview = models.CharField(
+        max_length=PREVIEW_LENGTH,
+        blank=True,
+        verbose_name=_("Last Message Preview"),
+    )
+    last_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name=_("+"),
+        verbose_name=_("Last Sender"),
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("Created At"),
+    )
+
+    objects = ConversationManager()
+
+    class Meta:
+        verbose_name = _("Conversation")
+        verbose_name_plural = _("Conversations")
+
+    def __str__(self):
+        return self.key
+
+
+class ConversationMemberQuerySet(models.QuerySet):
+    def inbox(self, user):
+        """
+        The inbox entries of `user`, with the conversation preview joined in.
+        The other member is rendered from their cached user card.
+        """
+        return self.filter(user=user).select_related('conversation').only(
+            'id', 'conversation', 'peer', 'unread_count', 'last_message_at', 'last_read_at',
+            'conversation__last_message_preview', 'conversation__last_sender',
+        )
+
+
+class ConversationMember(models.Model):
+    """
+    The inbox entry of a conversation for one of its members. Carries its own
+    copy of the last activity time, so that an inbox is read from a single
+    index.
+    """
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        primary_key=True,
+        editable=False,
+        auto_created=True,
+        verbose_name=_("ID"),
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name=_("members"),
+        verbose_name=_("Conversation"),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("conversation_memberships"),
+        verbose_name=_("User"),
+    )
+    peer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("+"),
+        verbose_name=_("Peer"),
+    )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Unread Count"),
+    )
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Last Message Time"),
+    )
+    last_read_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Last Read Time"),
+    )
+
+    objects = ConversationMemberQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Conversation Member")
+        verbose_name_plural = _("Conversation Members")
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='chats_member_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'last_message_at', 'id'], name='chats_member_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return "{user} in {conversation}".format(user=self.user_id, conversation=self.conversation_id)
+
 
 class Chats(models.Model):
     id = models.UUIDField(
@@ -21,6 +194,15 @@ class Chats(models.Model):
         verbose_name=_("UserID")
     )
 
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name=_("messages"),
+        verbose_name=_("Conversation")
+    )
+
     sender = models.CharField(
         max_length=150,
         null=True,
@@ -50,6 +232,103 @@ class Chats(models.Model):
     class Meta:
         verbose_name = _("Chat")
         verbose_name_plural = _("Chats")
+        indexes = [
+            models.Index(fields=['user', 'sent_at', 'id'], name='chats_user_sent_idx'),
+        ]
 
     def __str__(self):
         return str(self.user.id)
+
+
+def archive_path(instance, filename):
+    return 'chat_archives/{user_id}/{month}/{random_string}.ndjson.gz'.format(
+        user_id=instance.user_id, month=instance.month.strftime('%Y-%m'), random_string=uuid.uuid4().hex,
+    )
+
+
+class ChatArchiveSegment(models.Model):
+    """
+    The archived messages of one account for one calendar month (UTC), as
+    gzip-compressed NDJSON in the order they were sent. Segments only ever
+    grow: archiving more messages of the month stores a new file with a gzip
+    member appended and drops the previous one. `members` holds the offset
+    of each member with the sent_at and id of its first message, so that a
+    page is read from the members it falls in only.
+    """
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        primary_key=True,
+        editable=False,
+        auto_created=True,
+        verbose_name=_("ID"),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("chat_archive_segments"),
+        verbose_name=_("User"),
+    )
+    month = models.DateField(
+        verbose_name=_("Month"),
+    )
+    file = models.FileField(
+        upload_to=archive_path,
+        max_length=255,
+        verbose_name=_("File"),
+    )
+    members = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name=_("Members"),
+    )
+    message_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Message Count"),
+    )
+    first_sent_at = models.DateTimeField(
+        verbose_name=_("First Message Time"),
+    )
+    last_sent_at = models.DateTimeField(
+        verbose_name=_("Last Message Time"),
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_("Updated At"),
+    )
+
+    class Meta:
+        verbose_name = _("Chat Archive Segment")
+        verbose_name_plural = _("Chat Archive Segments")
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='chats_archive_segment_unique'),
+        ]
+
+    def __str__(self):
+        return "{user} {month}".format(user=self.user_id, month=self.month.strftime('%Y-%m'))
+
+
+def search_document(chat):
+    return chat.message or ''
+
+
+# Scoped by recipient, so that searching the messages of one account only
+# reads that account's postings.
+search_index = FullTextIndex(Chats, 'chats_chats_search', search_document, scope='user')
+
+
+@receiver(post_save, sender=Chats)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_index.update([instance])
+
+
+@receiver(post_delete, sender=Chats)
+def remove_from_search_index(sender, instance, **kwargs):
+    search_index.remove([instance.pk])
+
+
+@receiver(post_delete, sender=ChatArchiveSegment)
+def archive_segment_delete(sender, instance, **kwargs):
+    # Deferred so that storage is only touched once the deletion is committed.
+    transaction.on_commit(lambda: instance.file.delete(False))
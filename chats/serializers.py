@@ -1,9 +1,49 @@
-from rest_framework.serializers import ModelSerializer
+from django.utils.html import escape
+from rest_framework.serializers import ModelSerializer, SerializerMethodField
 
-from chats.models import Chats
+from account.serializers import AccountCardSerializer
+from blogapi.fulltext import SNIPPET_END, SNIPPET_START
+from chats.models import Chats, ConversationMember
 
 
 class ChatSerializer(ModelSerializer):
     class Meta:
         model = Chats
         fields = "__all__"
+
+
+class ChatSearchResultSerializer(ChatSerializer):
+    """
+    A message matching a search, with an HTML-escaped excerpt of its text in
+    which the matches are wrapped in <mark> elements.
+    """
+    snippet = SerializerMethodField()
+
+    def get_snippet(self, obj):
+        snippet = getattr(obj, 'search_snippet', None)
+        if snippet is None:
+            return None
+        return escape(snippet).replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+class InboxEntrySerializer(ModelSerializer):
+    """
+    One conversation of an inbox. Expects members loaded with
+    `ConversationMember.objects.inbox()`.
+    """
+    peer = AccountCardSerializer()
+    last_message_preview = SerializerMethodField()
+    last_sender = SerializerMethodField()
+
+    class Meta:
+        model = ConversationMember
+        fields = [
+            "conversation", "peer", "last_message_preview", "last_sender", "last_message_at", "unread_count",
+            "last_read_at"
+        ]
+
+    def get_last_message_preview(self, obj):
+        return obj.conversation.last_message_preview
+
+    def get_last_sender(self, obj):
+        return obj.conversation.last_sender_id
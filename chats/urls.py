@@ -1,9 +1,19 @@
 from django.urls import path
 
 from chats.views import (
-    ApiUserChatListView,
+    api_user_chat_list_view,
+    ApiChatHistoryView,
+    ApiChatSyncView,
+    ApiChatSearchView,
+    ApiInboxView,
+    api_conversation_read_view,
 )
 
 urlpatterns = [
-    path('detail/<uid>/', ApiUserChatListView.as_view(), name='chat_detail'),
+    path('detail/<uid>/', api_user_chat_list_view, name='chat_detail'),
+    path('history/', ApiChatHistoryView.as_view(), name='chat_history'),
+    path('sync/', ApiChatSyncView.as_view(), name='chat_sync'),
+    path('search/', ApiChatSearchView.as_view(), name='chat_search'),
+    path('inbox/', ApiInboxView.as_view(), name='inbox'),
+    path('conversations/<conversation_id>/read/', api_conversation_read_view, name='conversation_read'),
 ]
@@ -0,0 +1,49 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from blogapi.keyset import encode_cursor
+from chats.layers import get_channel_layer
+from chats.models import Chats, Conversation
+from chats.serializers import ChatSerializer
+
+MESSAGE_MAX_LENGTH = Chats._meta.get_field('message').max_length
+
+
+def create_chat_message(sender, recipient_id, message, timestamp=None):
+    """
+    Stores a message from `sender` to the account `recipient_id`, in their
+    conversation, and returns it serialized. Once committed, the message is pushed to the connections
+    of the recipient. Raises ValidationError when the recipient does not
+    exist or the message is empty or too long.
+    """
+    if not isinstance(message, str) or not message.strip():
+        raise ValidationError("The message must not be empty.")
+    if len(message) > MESSAGE_MAX_LENGTH:
+        raise ValidationError("The message must be at most {max} characters long.".format(max=MESSAGE_MAX_LENGTH))
+
+    try:
+        recipient_id = uuid.UUID(str(recipient_id))
+    except ValueError:
+        raise ValidationError("Unknown recipient.")
+    if not get_user_model().objects.filter(pk=recipient_id, is_active=True).exists():
+        raise ValidationError("Unknown recipient.")
+
+    with transaction.atomic():
+        conversation = Conversation.objects.between(sender.pk, recipient_id)
+        chat = Chats.objects.create(
+            user_id=recipient_id,
+            sender=str(sender.pk),
+            conversation=conversation,
+            message=message,
+            timestamp=timestamp if isinstance(timestamp, str) else None,
+        )
+        Conversation.objects.record_message(chat, sender.pk)
+    data = ChatSerializer(chat).data
+
+    # The cursor lets connected clients resume the sync endpoint from here.
+    message = {'type': 'chat.message', 'chat': data, 'cursor': encode_cursor((chat.sent_at, chat.id))}
+    transaction.on_commit(lambda: get_channel_layer().publish(recipient_id, message))
+    return data
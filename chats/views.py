@@ -1,22 +1,191 @@
-from rest_framework.authentication import TokenAuthentication
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from chats.models import Chats
-from chats.serializers import ChatSerializer
+from account.utils import ExpiringTokenAuthentication
+from blogapi.async_api import AsyncPageNumberPagination, async_api_view
+from blogapi.keyset import after, before, cursor_url, decode_cursor, encode_cursor
+from chats.archive import archived_messages, message_position
+from chats.models import Chats, ConversationMember, search_index
+from chats.serializers import ChatSearchResultSerializer, ChatSerializer, InboxEntrySerializer
 
 DOES_NOT_EXIST = "DOES_NOT_EXIST"
 
 
-class ApiUserChatListView(ListAPIView):
-    authentication_classes = [TokenAuthentication]
+@async_api_view
+async def api_user_chat_list_view(request, uid):
+    paginator = AsyncPageNumberPagination()
+    chats = await paginator.apaginate_queryset(Chats.objects.filter(user=uid).order_by('-sent_at'), request)
+    return paginator.get_paginated_response(ChatSerializer(chats, many=True).data)
+
+
+class ApiChatHistoryView(ListAPIView):
+    """
+    Cursor-paginated messages of the requesting user, newest first. Once the
+    messages still in the table run out, paging carries on into the archive,
+    so clients scroll through their whole history the same way.
+    """
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     serializer_class = ChatSerializer
-    lookup_url_kwarg = "uid"
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def list(self, request, *args, **kwargs):
+        position = decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        queryset = Chats.objects.filter(user=request.user)
+        if position is not None:
+            queryset = queryset.filter(before(position, 'sent_at', 'id'))
+
+        results = self.get_serializer(queryset.order_by('-sent_at', '-id')[:self.page_size + 1], many=True).data
+        if len(results) <= self.page_size:
+            # Archived messages are all older than the ones left in the table.
+            results += archived_messages(request.user.pk, position, self.page_size + 1 - len(results))
+
+        has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        return Response({
+            'next': cursor_url(request, message_position(results[-1]), self.cursor_query_param) if has_next else None,
+            'results': results,
+        })
+
+
+class ApiChatSyncView(ListAPIView):
+    """
+    The messages of the requesting user sent after the `since` cursor, oldest
+    first. `cursor` resumes the sync after the last message returned and
+    `next` is set while more messages are waiting, so a reconnecting client
+    only downloads what it missed.
+    """
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = ChatSerializer
+    page_size = settings.CHAT_SYNC_PAGE_SIZE
+    cursor_query_param = 'since'
+
+    def list(self, request, *args, **kwargs):
+        position = decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        queryset = Chats.objects.filter(user=request.user)
+        if position is not None:
+            queryset = queryset.filter(after(position, 'sent_at', 'id'))
+
+        page = list(queryset.order_by('sent_at', 'id')[:self.page_size + 1])
+        has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        if page:
+            position = (page[-1].sent_at, page[-1].id)
+
+        serializer = self.get_serializer(page, many=True)
+
+        return Response({
+            'next': cursor_url(request, position, self.cursor_query_param) if has_next else None,
+            'cursor': encode_cursor(position) if position is not None else None,
+            'results': serializer.data,
+        })
+
+
+class ApiChatSearchView(ListAPIView):
+    """
+    The messages of the requesting user matching the `q` search terms, newest
+    first and cursor-paginated, each with a highlighted snippet.
+    """
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = ChatSearchResultSerializer
+    page_size = api_settings.PAGE_SIZE
+    search_query_param = 'q'
+    cursor_query_param = 'cursor'
+
+    def list(self, request, *args, **kwargs):
+        position = decode_cursor(request.query_params.get(self.cursor_query_param))
+        query = request.query_params.get(self.search_query_param, '')
+
+        queryset = Chats.objects.filter(user=request.user)
+        if search_index.parse_query(query) is None:
+            queryset = queryset.none()
+        elif search_index.is_supported():
+            queryset = search_index.search(queryset, query, scope=request.user.pk, rank=False, snippet_field='message')
+        else:
+            queryset = queryset.filter(message__icontains=query)
+        if position is not None:
+            queryset = queryset.filter(before(position, 'sent_at', 'id'))
+
+        page = list(queryset.order_by('-sent_at', '-id')[:self.page_size + 1])
+        has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        serializer = self.get_serializer(page, many=True)
+
+        return Response({
+            'next': cursor_url(request, (page[-1].sent_at, page[-1].id),
+                               self.cursor_query_param) if has_next else None,
+            'results': serializer.data,
+        })
+
+
+class ApiInboxView(ListAPIView):
+    """
+    Cursor-paginated conversations of the requesting user, most recently
+    active first.
+    """
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = InboxEntrySerializer
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def list(self, request, *args, **kwargs):
+        position = decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        queryset = ConversationMember.objects.inbox(request.user).filter(last_message_at__isnull=False)
+        if position is not None:
+            queryset = queryset.filter(before(position, 'last_message_at', 'id'))
+
+        page = list(queryset.order_by('-last_message_at', '-id')[:self.page_size + 1])
+        has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        serializer = self.get_serializer(page, many=True)
+
+        return Response({
+            'next': cursor_url(request, (page[-1].last_message_at, page[-1].id),
+                               self.cursor_query_param) if has_next else None,
+            'results': serializer.data,
+        })
+
+
+@api_view(["POST"])
+@permission_classes((IsAuthenticated,))
+def api_conversation_read_view(request, conversation_id):
+    data = {}
+
+    try:
+        conversation_id = uuid.UUID(conversation_id)
+    except ValueError:
+        conversation_id = None
+
+    updated = conversation_id is not None and ConversationMember.objects.filter(
+        conversation=conversation_id, user=request.user,
+    ).update(unread_count=0, last_read_at=timezone.now())
 
-    def get_queryset(self, *args, **kwargs):
-        uid = self.kwargs.get(self.lookup_url_kwarg)
-        queryset = Chats.objects.filter(user=uid).order_by('-sent_at')
+    if not updated:
+        data['response'] = DOES_NOT_EXIST
+        return Response(data=data, status=status.HTTP_404_NOT_FOUND)
 
-        return queryset
+    data['response'] = "success"
+    return Response(data=data, status=status.HTTP_200_OK)
@@ -1 +1,13 @@
-# Register your models here.
+from django.contrib import admin
+from django.contrib.admin import site
+
+from feeds.models import HighFollowerAuthor
+
+
+class HighFollowerAuthorAdmin(admin.ModelAdmin):
+    model = HighFollowerAuthor
+    list_display = ["author", "follower_count", "last_updated"]
+    readonly_fields = ["last_updated"]
+
+
+site.register(HighFollowerAuthor, HighFollowerAuthorAdmin)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from feeds.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Trims every home timeline to the newest FEED_MAX_LENGTH entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-length',
+            type=int,
+            default=settings.FEED_MAX_LENGTH,
+            help="Number of entries kept per user.",
+        )
+
+    def handle(self, *args, **options):
+        max_length = options['max_length']
+
+        users = 0
+        deleted = 0
+        for user_id in list(TimelineEntry.objects.over_length(max_length)):
+            deleted += TimelineEntry.objects.trim(user_id, max_length)
+            users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            "Trimmed {deleted} entries from {users} timelines.".format(deleted=deleted, users=users)
+        ))
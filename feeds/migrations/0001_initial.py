@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('account', '0002_auto_20210721_1035'),
+        ('blog', '0006_blogpost_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HighFollowerAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='high_follower_author', serialize=False, to='account.account', verbose_name='Author')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Follower Count')),
+                ('last_updated', models.DateTimeField(auto_now=True, verbose_name='Last Updated')),
+            ],
+            options={
+                'verbose_name': 'High Follower Author',
+                'verbose_name_plural': 'High Follower Authors',
+            },
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_published', models.DateTimeField(verbose_name='Date Published')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Author')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='blog.blogpost', verbose_name='Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Timeline Entry',
+                'verbose_name_plural': 'Timeline Entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'date_published', 'post'], name='feeds_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='feeds_timeline_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='feeds_timeline_entry_unique'),
+        ),
+    ]
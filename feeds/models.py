@@ -1 +1,255 @@
-# Create your models here.
+import heapq
+import uuid
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.translation import ugettext_lazy as _
+
+from account.models import Follow
+from blog.models import BlogPost, blog_posts_bulk_created
+from blogapi.keyset import before
+
+
+class TimelineEntryManager(models.Manager):
+    def fan_out(self, blog_posts):
+        """
+        Pushes new posts to the home timeline of every follower of their
+        authors, trimming the timelines that grow past FEED_MAX_LENGTH with
+        one query per batch of followers.
+        Authors with more than FEED_FAN_OUT_MAX_FOLLOWERS followers are merged
+        into their followers' feeds at read time instead, and stay that way so
+        none of their posts go missing from the timelines.
+        """
+        posts_by_author = {}
+        for blog_post in blog_posts:
+            if not blog_post.is_draft:
+                posts_by_author.setdefault(blog_post.author, []).append(blog_post)
+
+        for author, author_posts in posts_by_author.items():
+            if HighFollowerAuthor.objects.filter(author=author).exists():
+                continue
+
+            followers = Follow.objects.filter(followee=author)
+            follower_count = followers.count()
+            if follower_count > settings.FEED_FAN_OUT_MAX_FOLLOWERS:
+                HighFollowerAuthor.objects.create(author=author, follower_count=follower_count)
+                continue
+
+            batch, follower_ids = [], []
+            for follower_id in followers.values_list('follower_id', flat=True).iterator():
+                follower_ids.append(follower_id)
+                batch.extend(self.model(
+                    user_id=follower_id,
+                    post=blog_post,
+                    author=author,
+                    date_published=blog_post.date_published,
+                ) for blog_post in author_posts)
+                if len(batch) >= 1000:
+                    self.push(batch, follower_ids)
+                    batch, follower_ids = [], []
+            self.push(batch, follower_ids)
+
+    def push(self, entries, users):
+        """
+        Inserts `entries` into the timelines of `users` and trims the ones
+        now longer than FEED_MAX_LENGTH, with one query each.
+        """
+        if not entries:
+            return
+
+        self.bulk_create(entries, ignore_conflicts=True)
+        self.trim_many(users, settings.FEED_MAX_LENGTH)
+
+    def trim_many(self, users, max_length):
+        """
+        Drops the entries of the timelines of `users` past the newest
+        `max_length` of each, in one DELETE. Returns the number deleted.
+        """
+        ranked = self.filter(user__in=users).annotate(position=Window(
+            RowNumber(), partition_by=[F('user')], order_by=[F('date_published').desc(), F('post').desc()],
+        )).values('id', 'position')
+        sql, params = ranked.query.sql_with_params()
+
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM {table} WHERE {pk} IN (SELECT id FROM ({ranked}) ranked WHERE position > %s)".format(
+                    table=connection.ops.quote_name(self.model._meta.db_table),
+                    pk=connection.ops.quote_name(self.model._meta.pk.column),
+                    ranked=sql,
+                ),
+                params + (max_length,),
+            )
+            return cursor.rowcount
+
+    def backfill(self, user, author):
+        """
+        Copies the latest posts of a newly followed author into `user`'s timeline.
+        Both are given by primary key.
+        """
+        if HighFollowerAuthor.objects.filter(author=author).exists():
+            return
+
+        recent_posts = BlogPost.objects.filter(
+            author=author, is_draft=False
+        ).order_by('-date_published', '-id').values_list('id', 'date_published')[:settings.FEED_BACKFILL_LENGTH]
+
+        self.push([
+            self.model(user_id=user, post_id=post_id, author_id=author, date_published=date_published)
+            for post_id, date_published in recent_posts
+        ], [user])
+
+    def trim(self, user, max_length):
+        """
+        Drops the entries of `user`'s timeline past the newest `max_length`.
+        """
+        # The last entry kept, and whether any follows it.
+        keys = self.filter(user=user).order_by(
+            '-date_published', '-post_id'
+        ).values_list('date_published', 'post_id')[max_length - 1:max_length + 1]
+
+        if len(keys) < 2:
+            return 0
+
+        deleted, _ = self.filter(before(keys[0], 'date_published', 'post_id'), user=user).delete()
+        return deleted
+
+    def over_length(self, max_length):
+        return self.values('user').annotate(
+            length=Count('*')
+        ).filter(length__gt=max_length).values_list('user', flat=True)
+
+    def home_feed(self, user, position, limit):
+        """
+        Returns up to `limit` (date_published, post_id) keys of `user`'s home
+        feed after `position`, newest first. The materialized timeline and the
+        posts of followed high-follower authors are each read with one index
+        range scan and merged.
+        """
+        entries = self.filter(user=user)
+        high_follower_posts = BlogPost.objects.filter(
+            is_draft=False,
+            author__in=HighFollowerAuthor.objects.filter(
+                author__in=Follow.objects.filter(follower=user).values('followee')
+            ).values('author'),
+        )
+
+        if position is not None:
+            entries = entries.filter(before(position, 'date_published', 'post_id'))
+            high_follower_posts = high_follower_posts.filter(before(position, 'date_published', 'id'))
+
+        entries = entries.order_by(
+            '-date_published', '-post_id'
+        ).values_list('date_published', 'post_id')[:limit]
+        high_follower_posts = high_follower_posts.order_by(
+            '-date_published', '-id'
+        ).values_list('date_published', 'id')[:limit]
+
+        keys = []
+        for key in heapq.merge(entries, high_follower_posts, reverse=True):
+            if not keys or keys[-1] != key:
+                keys.append(key)
+            if len(keys) == limit:
+                break
+        return keys
+
+    def remove_author(self, user, author_ids):
+        return self.filter(user=user, author__in=author_ids).delete()
+
+
+class TimelineEntry(models.Model):
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        primary_key=True,
+        editable=False,
+        auto_created=True,
+        verbose_name=_("ID"),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("timeline_entries"),
+        verbose_name=_("User")
+    )
+    post = models.ForeignKey(
+        BlogPost,
+        on_delete=models.CASCADE,
+        related_name=_("timeline_entries"),
+        verbose_name=_("Post")
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name=_("+"),
+        verbose_name=_("Author")
+    )
+    date_published = models.DateTimeField(
+        verbose_name=_("Date Published")
+    )
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        verbose_name = _("Timeline Entry")
+        verbose_name_plural = _("Timeline Entries")
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='feeds_timeline_entry_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date_published', 'post'], name='feeds_timeline_idx'),
+            models.Index(fields=['user', 'author'], name='feeds_timeline_author_idx'),
+        ]
+
+    def __str__(self):
+        return "{user} - {post}".format(user=self.user_id, post=self.post_id)
+
+
+class HighFollowerAuthor(models.Model):
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name=_("high_follower_author"),
+        verbose_name=_("Author")
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Follower Count")
+    )
+    last_updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_("Last Updated")
+    )
+
+    class Meta:
+        verbose_name = _("High Follower Author")
+        verbose_name_plural = _("High Follower Authors")
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+@receiver(post_save, sender=BlogPost)
+def fan_out_blog_post(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.fan_out([instance])
+
+
+@receiver(blog_posts_bulk_created, sender=BlogPost)
+def fan_out_blog_posts(sender, instances, **kwargs):
+    TimelineEntry.objects.fan_out(instances)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.backfill(instance.follower_id, instance.followee_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    TimelineEntry.objects.remove_author(instance.follower_id, [instance.followee_id])
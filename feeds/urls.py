@@ -1,4 +1,9 @@
+from django.urls import path
 
-urlpatterns = [
+from feeds.views import (
+    ApiHomeFeedView,
+)
 
+urlpatterns = [
+    path('', ApiHomeFeedView.as_view(), name='home_feed'),
 ]
@@ -1 +1,36 @@
-# Create your views here.
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from account.utils import ExpiringTokenAuthentication
+from blog.models import BlogPost
+from blog.serializers import BlogPostSerializer
+from blogapi.keyset import decode_cursor, cursor_url
+from feeds.models import TimelineEntry
+
+
+class ApiHomeFeedView(ListAPIView):
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    serializer_class = BlogPostSerializer
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def list(self, request, *args, **kwargs):
+        position = decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        keys = TimelineEntry.objects.home_feed(request.user, position, self.page_size + 1)
+        has_next = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+
+        posts = BlogPost.objects.for_viewer(request.user).filter(is_draft=False).in_bulk([pk for _, pk in keys])
+        page = [posts[pk] for _, pk in keys if pk in posts]
+
+        serializer = self.get_serializer(page, many=True)
+
+        return Response({
+            'next': cursor_url(request, keys[-1], self.cursor_query_param) if has_next else None,
+            'results': serializer.data,
+        })